@@ -0,0 +1,189 @@
+"""
+Login session storage backends.
+
+The default backend keeps sessions in data/sessions.json (cached in memory and
+re-read when the file changes). Set SESSION_BACKEND=redis and REDIS_URL to share
+sessions between worker processes or hosts without sticky load balancing.
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Any, Protocol, Tuple
+from datetime import datetime
+
+from src.utils.exceptions import ConfigError
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DATA_DIR = Path("data")
+SESSIONS_FILE = DATA_DIR / "sessions.json"
+
+SESSION_BACKEND = (os.getenv("SESSION_BACKEND") or "memory").strip().lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_SESSION_PREFIX = os.getenv("REDIS_SESSION_PREFIX", "instaforge:sess:")
+
+
+class SessionStore(Protocol):
+    """Storage for session records: {"user_id", "created_at", "expires_at"} keyed by token"""
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    def put(self, token: str, data: Dict[str, Any], ttl_seconds: int) -> None:
+        ...
+
+    def delete(self, token: str) -> None:
+        ...
+
+    def remove_expired(self, now: datetime) -> int:
+        ...
+
+
+class InMemorySessionStore:
+    """
+    Sessions held in memory and persisted to a JSON file.
+
+    The in-memory map is re-read only when the file's mtime changes, so writes
+    from another worker process sharing the same data/ directory are picked up.
+    Writers copy the map, change the copy and swap it in after it is saved
+    (copy-on-write), so readers never take the lock on the hot path and never
+    see a map that is being mutated or iterated.
+    """
+
+    def __init__(self, sessions_file: Path = SESSIONS_FILE):
+        self.sessions_file = Path(sessions_file)
+        self._lock = threading.RLock()
+        # (file mtime_ns, sessions map) swapped as one reference so lock-free readers
+        # always compare against the stamp that belongs to the map they read
+        self._snapshot: Optional[Tuple[Optional[int], Dict[str, Dict[str, Any]]]] = None
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        snapshot = self._snapshot
+        if snapshot is not None and self._file_mtime_ns() == snapshot[0]:
+            return snapshot[1].get(token)
+        with self._lock:
+            return self._load().get(token)
+
+    def put(self, token: str, data: Dict[str, Any], ttl_seconds: int) -> None:
+        # Expiry is carried in data["expires_at"] and enforced by the caller / remove_expired
+        with self._lock:
+            sessions = dict(self._load())
+            sessions[token] = data
+            self._save(sessions)
+
+    def delete(self, token: str) -> None:
+        with self._lock:
+            current = self._load()
+            if token in current:
+                sessions = dict(current)
+                del sessions[token]
+                self._save(sessions)
+
+    def remove_expired(self, now: datetime) -> int:
+        with self._lock:
+            current = self._load()
+            sessions = {
+                token: data for token, data in current.items()
+                if now <= datetime.fromisoformat(data["expires_at"])
+            }
+            removed = len(current) - len(sessions)
+            if removed:
+                self._save(sessions)
+            return removed
+
+    def _file_mtime_ns(self) -> Optional[int]:
+        try:
+            return self.sessions_file.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Return the current sessions map (treat as read-only), re-reading the file only if it changed on disk"""
+        stamp = self._file_mtime_ns()
+        snapshot = self._snapshot
+        if snapshot is not None and stamp == snapshot[0]:
+            return snapshot[1]
+
+        sessions: Dict[str, Dict[str, Any]] = {}
+        if stamp is not None:
+            try:
+                with open(self.sessions_file, "r", encoding="utf-8") as f:
+                    sessions = json.load(f)
+            except (json.JSONDecodeError, IOError):
+                sessions = {}
+        self._snapshot = (stamp, sessions)
+        return sessions
+
+    def _save(self, sessions: Dict[str, Dict[str, Any]]) -> None:
+        """Atomically save sessions to the JSON file"""
+        self.sessions_file.parent.mkdir(exist_ok=True, parents=True)
+
+        with tempfile.NamedTemporaryFile(mode='w', dir=self.sessions_file.parent, delete=False, encoding='utf-8') as tf:
+            json.dump(sessions, tf, indent=2, ensure_ascii=False)
+            temp_path = Path(tf.name)
+
+        try:
+            # Atomic move/replace
+            shutil.move(str(temp_path), str(self.sessions_file))
+        except Exception as e:
+            # Clean up temp file if move failed (the cached map was never swapped, so it still matches disk)
+            if temp_path.exists():
+                temp_path.unlink()
+            raise ConfigError(f"Failed to save sessions to {self.sessions_file}: {str(e)}")
+        self._snapshot = (self._file_mtime_ns(), sessions)
+
+
+class RedisSessionStore:
+    """Sessions stored in Redis as JSON with SETEX, so Redis expires them itself"""
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = REDIS_SESSION_PREFIX):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("redis is required for SESSION_BACKEND=redis. Install with: pip install redis")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        raw = self._client.get(self.prefix + token)
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)
+        except (json.JSONDecodeError, TypeError):
+            return None
+
+    def put(self, token: str, data: Dict[str, Any], ttl_seconds: int) -> None:
+        self._client.setex(self.prefix + token, max(1, int(ttl_seconds)), json.dumps(data))
+
+    def delete(self, token: str) -> None:
+        self._client.delete(self.prefix + token)
+
+    def remove_expired(self, now: datetime) -> int:
+        # Redis drops keys when their TTL runs out
+        return 0
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Return the process-wide session store selected by SESSION_BACKEND (memory or redis)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if SESSION_BACKEND == "redis":
+                    _store = RedisSessionStore()
+                    logger.info("Using Redis session store", prefix=REDIS_SESSION_PREFIX)
+                else:
+                    if SESSION_BACKEND not in ("memory", "file"):
+                        logger.warning("Unknown SESSION_BACKEND, using memory", backend=SESSION_BACKEND)
+                    _store = InMemorySessionStore()
+    return _store
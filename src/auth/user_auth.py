@@ -4,11 +4,9 @@ User authentication service with password hashing and session management.
 
 import os
 import secrets
-import json
-import shutil
-import tempfile
-from pathlib import Path
-from typing import Optional, Dict, Any
+import threading
+import time
+from typing import Dict, Optional, Tuple
 from datetime import datetime, timedelta
 
 try:
@@ -17,7 +15,10 @@ except ImportError:
     raise ImportError("bcrypt is required. Install with: pip install bcrypt")
 
 from src.models.user import User
-from src.utils.exceptions import ConfigError
+from src.auth.session_store import get_session_store
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 # Lazy import to avoid circular dependency
 def _get_user_store():
@@ -25,12 +26,49 @@ def _get_user_store():
     return user_store
 
 
-DATA_DIR = Path("data")
-SESSIONS_FILE = DATA_DIR / "sessions.json"
-
 # Session expiration: 24 hours
 SESSION_EXPIRY_HOURS = int(os.getenv("SESSION_EXPIRY_HOURS", "24"))
 
+# Where sessions live (data/sessions.json or Redis) is chosen by SESSION_BACKEND,
+# see src/auth/session_store.py.
+
+# Successful validations are reused for a few seconds so bursts of dashboard requests
+# with the same token skip the store and user lookups. logout_session drops the entry.
+_VALIDATION_CACHE_TTL = 5.0
+_VALIDATION_CACHE_MAXSIZE = 1024
+_validation_cache: Dict[str, Tuple[float, User]] = {}
+
+# Unknown/expired tokens are remembered for less time (a token never becomes valid later).
+# Kept in their own map so a client sending random tokens can only flush this one.
+_INVALID_TOKEN_TTL = 2.0
+_INVALID_TOKEN_CACHE_MAXSIZE = 4096
+_invalid_token_cache: Dict[str, float] = {}
+
+
+def _remember_invalid_token(token: str) -> None:
+    if len(_invalid_token_cache) >= _INVALID_TOKEN_CACHE_MAXSIZE:
+        _invalid_token_cache.clear()
+    _invalid_token_cache[token] = time.monotonic() + _INVALID_TOKEN_TTL
+
+
+def peek_cached_session(token: str) -> Tuple[bool, Optional[User]]:
+    """
+    Return (hit, user) from the validation caches without touching the session store.
+    Lets async callers skip the threadpool hop when validate_session would answer from cache.
+    """
+    now = time.monotonic()
+    cached = _validation_cache.get(token)
+    if cached is not None and now < cached[0]:
+        return True, cached[1]
+    invalid_until = _invalid_token_cache.get(token)
+    if invalid_until is not None and now < invalid_until:
+        return True, None
+    return False, None
+
+
+_sweeper_stop = threading.Event()
+_sweeper_thread: Optional[threading.Thread] = None
+
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt"""
@@ -50,19 +88,17 @@ def create_session(user_id: str) -> str:
     """Create a new session and return the session token"""
     token = secrets.token_urlsafe(32)
     
-    # Load existing sessions
-    sessions = _load_sessions()
-    
     # Create session data
-    expires_at = (datetime.utcnow() + timedelta(hours=SESSION_EXPIRY_HOURS)).isoformat()
-    sessions[token] = {
-        "user_id": user_id,
-        "created_at": datetime.utcnow().isoformat(),
-        "expires_at": expires_at,
-    }
-    
-    # Save sessions
-    _save_sessions(sessions)
+    now = datetime.utcnow()
+    get_session_store().put(
+        token,
+        {
+            "user_id": user_id,
+            "created_at": now.isoformat(),
+            "expires_at": (now + timedelta(hours=SESSION_EXPIRY_HOURS)).isoformat(),
+        },
+        SESSION_EXPIRY_HOURS * 3600,
+    )
     
     return token
 
@@ -72,19 +108,29 @@ def validate_session(token: str) -> Optional[User]:
     if not token:
         return None
     
-    sessions = _load_sessions()
-    
-    if token not in sessions:
+    cached = _validation_cache.get(token)
+    if cached is not None:
+        if time.monotonic() < cached[0]:
+            return cached[1]
+        _validation_cache.pop(token, None)
+    invalid_until = _invalid_token_cache.get(token)
+    if invalid_until is not None:
+        if time.monotonic() < invalid_until:
+            return None
+        _invalid_token_cache.pop(token, None)
+    
+    store = get_session_store()
+    session_data = store.get(token)
+    if session_data is None:
+        _remember_invalid_token(token)
         return None
     
-    session_data = sessions[token]
-    
     # Check expiration
     expires_at = datetime.fromisoformat(session_data["expires_at"])
     if datetime.utcnow() > expires_at:
         # Session expired, remove it
-        del sessions[token]
-        _save_sessions(sessions)
+        store.delete(token)
+        _remember_invalid_token(token)
         return None
     
     # Get user (lazy import to avoid circular dependency)
@@ -94,65 +140,59 @@ def validate_session(token: str) -> Optional[User]:
     # Check if user is active
     if not user or not user.is_active:
         # User is inactive or doesn't exist, remove session
-        if token in sessions:
-            del sessions[token]
-            _save_sessions(sessions)
+        logout_session(token)
         return None
     
+    # Never serve from cache past the session's own expiry
+    ttl = min(_VALIDATION_CACHE_TTL, (expires_at - datetime.utcnow()).total_seconds())
+    if len(_validation_cache) >= _VALIDATION_CACHE_MAXSIZE:
+        _validation_cache.clear()
+    _validation_cache[token] = (time.monotonic() + ttl, user)
     return user
 
 
 def logout_session(token: str) -> None:
     """Invalidate a session"""
-    sessions = _load_sessions()
-    if token in sessions:
-        del sessions[token]
-        _save_sessions(sessions)
-
-
-def cleanup_expired_sessions() -> None:
-    """Remove expired sessions (call periodically)"""
-    sessions = _load_sessions()
-    now = datetime.utcnow()
-    
-    expired_tokens = []
-    for token, session_data in sessions.items():
-        expires_at = datetime.fromisoformat(session_data["expires_at"])
-        if now > expires_at:
-            expired_tokens.append(token)
-    
-    if expired_tokens:
-        for token in expired_tokens:
-            del sessions[token]
-        _save_sessions(sessions)
-
-
-def _load_sessions() -> Dict[str, Any]:
-    """Load sessions from JSON file"""
-    if not SESSIONS_FILE.exists():
-        return {}
-    
-    try:
-        with open(SESSIONS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
-        return {}
-
-
-def _save_sessions(sessions: Dict[str, Any]) -> None:
-    """Atomically save sessions to JSON file"""
-    DATA_DIR.mkdir(exist_ok=True, parents=True)
-    
-    dir_path = SESSIONS_FILE.parent
-    with tempfile.NamedTemporaryFile(mode='w', dir=dir_path, delete=False, encoding='utf-8') as tf:
-        json.dump(sessions, tf, indent=2, ensure_ascii=False)
-        temp_path = Path(tf.name)
-    
-    try:
-        # Atomic move/replace
-        shutil.move(str(temp_path), str(SESSIONS_FILE))
-    except Exception as e:
-        # Clean up temp file if move failed
-        if temp_path.exists():
-            temp_path.unlink()
-        raise ConfigError(f"Failed to save sessions to {SESSIONS_FILE}: {str(e)}")
+    _validation_cache.pop(token, None)
+    get_session_store().delete(token)
+
+
+def cleanup_expired_sessions() -> int:
+    """Remove expired sessions and return how many were removed (run periodically by the session sweeper)"""
+    return get_session_store().remove_expired(datetime.utcnow())
+
+
+def _session_sweep_loop(interval_seconds: int) -> None:
+    """Reap expired sessions every interval_seconds so idle tokens don't linger in the session store."""
+    logger.info("Session sweeper started", interval_seconds=interval_seconds)
+    while not _sweeper_stop.wait(interval_seconds):
+        try:
+            removed = cleanup_expired_sessions()
+            if removed:
+                logger.info("Expired sessions removed", count=removed)
+        except Exception as e:
+            logger.warning("Session sweep failed", error=str(e))
+
+
+def start_session_sweeper(interval_seconds: int = 60) -> None:
+    """Start background thread that removes expired sessions. Idempotent."""
+    global _sweeper_thread
+    if _sweeper_thread is not None:
+        return
+    _sweeper_stop.clear()
+    _sweeper_thread = threading.Thread(
+        target=_session_sweep_loop,
+        args=(interval_seconds,),
+        daemon=True,
+        name="session-sweeper",
+    )
+    _sweeper_thread.start()
+
+
+def stop_session_sweeper() -> None:
+    """Stop the session sweeper thread."""
+    global _sweeper_thread
+    _sweeper_stop.set()
+    if _sweeper_thread is not None:
+        _sweeper_thread.join(timeout=2)
+        _sweeper_thread = None
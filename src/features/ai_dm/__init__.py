@@ -1,5 +1,12 @@
 """AI DM Auto Reply feature - Automated responses to Instagram DMs using OpenAI"""
 
-from .ai_dm_handler import AIDMHandler, get_ai_reply
-
 __all__ = ["AIDMHandler", "get_ai_reply"]
+
+
+def __getattr__(name):
+    # The handler (and its OpenAI / AI Brain dependencies) is loaded on first use, so
+    # importing a sibling module such as dm_inbox_store stays cheap
+    if name in __all__:
+        from . import ai_dm_handler
+        return getattr(ai_dm_handler, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
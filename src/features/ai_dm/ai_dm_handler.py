@@ -3,6 +3,7 @@
 import os
 import time
 import random
+import threading
 from typing import Optional, Dict, Any
 from datetime import datetime
 
@@ -39,6 +40,23 @@ MAX_REPLIES_PER_USER_PER_DAY = 10
 REPLY_DELAY_MIN = 3
 REPLY_DELAY_MAX = 6
 
+# OpenAI clients shared across handler instances, keyed by API key. Handlers are built per
+# DM (their tracking/AI Brain state is read from disk each time), but the client holds the
+# HTTP connection pool, so reusing it keeps connections to the API alive between DMs.
+_openai_clients: Dict[str, Any] = {}
+_openai_clients_lock = threading.Lock()
+
+
+def _shared_openai_client(api_key: str):
+    """Return the process-wide OpenAI client for api_key, creating it on first use."""
+    with _openai_clients_lock:
+        client = _openai_clients.get(api_key)
+        if client is None:
+            from openai import OpenAI
+            client = OpenAI(api_key=api_key)
+            _openai_clients[api_key] = client
+        return client
+
 
 class AIDMHandler:
     """
@@ -76,9 +94,9 @@ class AIDMHandler:
         
         if self._api_key:
             try:
-                from openai import OpenAI, AuthenticationError
+                from openai import AuthenticationError
                 
-                self._client = OpenAI(api_key=self._api_key)
+                self._client = _shared_openai_client(self._api_key)
                 self._AuthError = AuthenticationError
                 logger.info(
                     "AI_DM_HANDLER",
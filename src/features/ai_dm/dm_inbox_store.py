@@ -4,6 +4,7 @@ Isolated module. No changes to existing AI DM logic.
 """
 
 import json
+import threading
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
@@ -16,6 +17,9 @@ DATA_DIR = Path("data")
 INBOX_FILE = DATA_DIR / "dm_inbox.json"
 RETENTION_DAYS = 30
 
+# Serializes load -> mutate -> save so concurrent webhook workers don't drop each other's writes
+_lock = threading.RLock()
+
 
 def _ensure_dir() -> None:
     DATA_DIR.mkdir(exist_ok=True, parents=True)
@@ -72,7 +76,26 @@ def add_message(
     Add an incoming DM to the inbox store.
     Call from webhook after extracting message data.
     """
-    data = _load()
+    with _lock:
+        data = _load()
+        _add_message(
+            data, account_id, user_id, username, message,
+            message_id=message_id, ai_reply_suggested=ai_reply_suggested, sent_at=sent_at, status=status,
+        )
+        _save(data)
+
+
+def _add_message(
+    data: Dict[str, Any],
+    account_id: str,
+    user_id: str,
+    username: str,
+    message: str,
+    message_id: Optional[str] = None,
+    ai_reply_suggested: Optional[str] = None,
+    sent_at: Optional[str] = None,
+    status: str = "received",
+) -> None:
     now = datetime.utcnow().isoformat()
     key = _conv_key(str(account_id or ""), str(user_id or ""))
 
@@ -117,8 +140,6 @@ def add_message(
     data["messages"] = [m for m in data["messages"] if m.get("timestamp", "") >= cutoff]
     data["updated_at"] = now
 
-    _save(data)
-
 
 def list_conversations(account_id: str) -> List[Dict[str, Any]]:
     """List conversations for an account, newest first."""
@@ -149,7 +170,16 @@ def get_messages(account_id: str, user_id: str) -> List[Dict[str, Any]]:
 
 def update_suggestion(account_id: str, user_id: str, ai_reply_suggested: str) -> bool:
     """Update AI suggested reply for the latest message in conversation."""
-    data = _load()
+    with _lock:
+        data = _load()
+        updated = _update_suggestion(data, account_id, user_id, ai_reply_suggested)
+        if updated:
+            data["updated_at"] = datetime.utcnow().isoformat()
+            _save(data)
+        return updated
+
+
+def _update_suggestion(data: Dict[str, Any], account_id: str, user_id: str, ai_reply_suggested: str) -> bool:
     key = _conv_key(str(account_id or ""), str(user_id or ""))
     convs = data.get("conversations") or {}
     conv_updated = False
@@ -165,20 +195,50 @@ def update_suggestion(account_id: str, user_id: str, ai_reply_suggested: str) ->
             m["ai_reply_suggested"] = ai_reply_suggested
             msg_updated = True
             break
-    if conv_updated or msg_updated:
-        data["updated_at"] = datetime.utcnow().isoformat()
-        _save(data)
     return conv_updated or msg_updated
 
 
 def mark_sent(account_id: str, user_id: str) -> None:
     """Mark that a reply was sent to this user."""
-    data = _load()
+    with _lock:
+        data = _load()
+        _mark_sent(data, account_id, user_id)
+        data["updated_at"] = datetime.utcnow().isoformat()
+        _save(data)
+
+
+def _mark_sent(data: Dict[str, Any], account_id: str, user_id: str) -> None:
     key = _conv_key(str(account_id or ""), str(user_id or ""))
     convs = data.get("conversations") or {}
     if key in convs:
         convs[key]["status"] = "sent"
         convs[key]["ai_reply_suggested"] = None
     data["conversations"] = convs
-    data["updated_at"] = datetime.utcnow().isoformat()
-    _save(data)
+
+
+def apply_updates(
+    account_id: str,
+    user_id: str,
+    *,
+    add: Optional[Dict[str, Any]] = None,
+    suggestion: Optional[str] = None,
+    sent: bool = False,
+) -> None:
+    """
+    Apply several inbox changes for one conversation with a single load/save.
+
+    add holds add_message keyword arguments (username, message, message_id, ...);
+    suggestion and sent have the same effect as update_suggestion and mark_sent, applied in that order.
+    """
+    if add is None and suggestion is None and not sent:
+        return
+    with _lock:
+        data = _load()
+        if add is not None:
+            _add_message(data, account_id, user_id, **add)
+        if suggestion is not None:
+            _update_suggestion(data, account_id, user_id, suggestion)
+        if sent:
+            _mark_sent(data, account_id, user_id)
+        data["updated_at"] = datetime.utcnow().isoformat()
+        _save(data)
@@ -45,7 +45,7 @@ class PostDMConfig:
         trigger_mode: Optional[str] = "AUTO",
         trigger_word: Optional[str] = None,
         ai_enabled: Optional[bool] = None,
-    ):
+    ) -> Optional[Dict[str, Any]]:
         """
         Set file/link to send when someone comments on a specific post.
 
@@ -57,6 +57,9 @@ class PostDMConfig:
             trigger_mode: "AUTO" (any comment) or "KEYWORD"
             trigger_word: Specific word to trigger DM (if mode is KEYWORD)
             ai_enabled: Use AI to generate reply text (default False). Stored with post config.
+
+        Returns:
+            The persisted post config (same shape as get_post_dm_config), or None if it was removed
         """
         key = f"{account_id}:{media_id}"
 
@@ -67,7 +70,7 @@ class PostDMConfig:
             if key in self._config:
                 del self._config[key]
                 self._save_config()
-            return
+            return None
 
         existing = self._config.get(key, {})
         ai_val = ai_enabled if ai_enabled is not None else existing.get("ai_enabled", False)
@@ -93,6 +96,7 @@ class PostDMConfig:
             trigger_word=trigger_word,
             ai_enabled=ai_val,
         )
+        return dict(existing)
 
     def get_post_dm_config(self, account_id: str, media_id: str) -> Optional[Dict[str, Any]]:
         """
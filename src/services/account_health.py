@@ -147,28 +147,31 @@ class AccountHealthService:
         
         return result
     
+    def check_account_health_safe(self, account_id: str) -> HealthCheckResult:
+        """Run check_account_health, turning unexpected errors into a CRITICAL result"""
+        try:
+            return self.check_account_health(account_id)
+        except Exception as e:
+            logger.error(
+                "Health check failed for account",
+                account_id=account_id,
+                error=str(e),
+            )
+            # Create failed result
+            return HealthCheckResult(
+                account_id=account_id,
+                status=HealthStatus.CRITICAL,
+                checks={"error": {"status": "failed", "error": str(e)}},
+                timestamp=datetime.now(),
+            )
+    
     def check_all_accounts(self) -> Dict[str, HealthCheckResult]:
         """Check health for all accounts"""
         results = {}
         accounts = self.account_service.list_accounts()
         
         for account in accounts:
-            try:
-                result = self.check_account_health(account.account_id)
-                results[account.account_id] = result
-            except Exception as e:
-                logger.error(
-                    "Health check failed for account",
-                    account_id=account.account_id,
-                    error=str(e),
-                )
-                # Create failed result
-                results[account.account_id] = HealthCheckResult(
-                    account_id=account.account_id,
-                    status=HealthStatus.CRITICAL,
-                    checks={"error": {"status": "failed", "error": str(e)}},
-                    timestamp=datetime.now(),
-                )
+            results[account.account_id] = self.check_account_health_safe(account.account_id)
         
         return results
     
@@ -176,6 +179,24 @@ class AccountHealthService:
         """Get last health check result for an account"""
         return self.health_status.get(account_id)
     
+    def get_recent_health(self, account_id: str, max_age_seconds: float) -> Optional[HealthCheckResult]:
+        """
+        Get last health check result if it is younger than max_age_seconds.
+        
+        Args:
+            account_id: Account identifier
+            max_age_seconds: Maximum age of the cached result
+            
+        Returns:
+            Cached HealthCheckResult, or None if missing or stale
+        """
+        result = self.health_status.get(account_id)
+        if result is None:
+            return None
+        if (datetime.now() - result.timestamp).total_seconds() >= max_age_seconds:
+            return None
+        return result
+    
     def start_monitoring(self) -> None:
         """Start background health monitoring"""
         if self.monitoring:
@@ -27,6 +27,8 @@ class AccountService:
         video_upload_timeout: int = 180,
     ):
         self.accounts = {acc.account_id: acc for acc in accounts}
+        # Bumped on every change to self.accounts so callers can cache derived values
+        self.accounts_version = 0
         self.clients: Dict[str, InstagramClient] = {}
         self.posting_clients: Dict[str, InstagramClient] = {}
         self.lock = Lock()
@@ -143,6 +145,7 @@ class AccountService:
     def update_accounts(self, accounts: List[Account]) -> None:
         """Replace accounts and re-initialize clients (e.g. after add/update/delete or OAuth persist)."""
         self.accounts = {acc.account_id: acc for acc in accounts}
+        self.accounts_version += 1
         self.clients.clear()
         self.posting_clients.clear()
         self._initialize_clients()
@@ -265,6 +268,7 @@ class AccountService:
             
             # Add to accounts dict
             self.accounts[account.account_id] = account
+            self.accounts_version += 1
             
             # Initialize client for this account
             try:
@@ -300,6 +304,7 @@ class AccountService:
             except Exception as e:
                 # Rollback: remove from accounts dict
                 self.accounts.pop(account.account_id, None)
+                self.accounts_version += 1
                 logger.error(
                     "Failed to add account",
                     account_id=account.account_id,
@@ -323,6 +328,7 @@ class AccountService:
             
             # Remove from accounts dict
             self.accounts.pop(account_id, None)
+            self.accounts_version += 1
             
             # Remove clients
             self.clients.pop(account_id, None)
@@ -346,6 +352,7 @@ class AccountService:
             
             # Update account
             self.accounts[account.account_id] = account
+            self.accounts_version += 1
             
             # Re-initialize clients for this account
             try:
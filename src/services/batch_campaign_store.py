@@ -46,10 +46,11 @@ def create_campaign(
     hashtags: Optional[List[str]] = None,
     file_count: int = 0,
     end_date: Optional[datetime] = None,
+    campaign_id: Optional[str] = None,
 ) -> str:
-    """Create a new batch campaign and return its ID."""
+    """Create a new batch campaign and return its ID (generated unless campaign_id is given)."""
     campaigns = load_campaigns()
-    campaign_id = str(uuid.uuid4())
+    campaign_id = campaign_id or str(uuid.uuid4())
     campaign = {
         "campaign_id": campaign_id,
         "account_id": account_id,
@@ -190,6 +190,7 @@ def process_batch_upload(
     hashtags: Optional[List[str]] = None,
     base_url: str = "",
     uploads_root: Optional[Path] = None,
+    campaign_id: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Process batch upload: create campaign and schedule posts.
@@ -202,6 +203,8 @@ def process_batch_upload(
         caption: Caption for all posts
         hashtags: Hashtags for all posts
         base_url: Base URL for serving uploaded files (e.g., "http://localhost:8000")
+        uploads_root: Uploads directory the file URLs are made relative to
+        campaign_id: Campaign ID to use (e.g. the name of the directory holding files); generated if omitted
     
     Returns:
         Dict with campaign_id, scheduled_count, errors
@@ -248,6 +251,7 @@ def process_batch_upload(
         caption=caption,
         hashtags=hashtags or [],
         file_count=len(files),
+        campaign_id=campaign_id,
     )
     
     scheduled_count = 0
@@ -1,5 +1,6 @@
 """Logging configuration"""
 
+import json
 import logging
 import sys
 from pathlib import Path
@@ -8,6 +9,20 @@ import structlog
 from structlog.stdlib import LoggerFactory
 from rich.logging import RichHandler
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _orjson_dumps(obj, default=None, **kwargs) -> str:
+    """json.dumps-compatible serializer for JSONRenderer backed by orjson (returns str for logging handlers)"""
+    try:
+        return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    except TypeError:
+        # Values orjson rejects (e.g. ints beyond 64 bits) fall back to the stdlib encoder
+        return json.dumps(obj, default=default, **kwargs)
+
 
 def setup_logger(
     log_level: str = "INFO",
@@ -69,9 +84,9 @@ def setup_logger(
         # Let's use structlog's ProcessorFormatter to handle this differentiation
         from structlog.stdlib import ProcessorFormatter
         
-        # JSON Processor for File
+        # JSON Processor for File (orjson-backed when installed)
         json_processor = ProcessorFormatter(
-            processor=structlog.processors.JSONRenderer(),
+            processor=structlog.processors.JSONRenderer(serializer=_orjson_dumps) if orjson else structlog.processors.JSONRenderer(),
             foreign_pre_chain=[
                 structlog.contextvars.merge_contextvars,
                 structlog.processors.TimeStamper(fmt="iso"),
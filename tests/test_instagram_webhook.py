@@ -0,0 +1,44 @@
+"""Tests for Instagram webhook DM payload parsing"""
+
+import pytest
+
+from web.instagram_webhook import _extract_dm_fields
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        # Messenger Platform format: entry.messaging[] item
+        (
+            {"sender": {"id": "1"}, "recipient": {"id": "2"}, "message": {"mid": "m1", "text": "hi"}},
+            ("1", "hi", "m1", ""),
+        ),
+        # Graph API format with from/username
+        (
+            {"from": {"id": "1", "username": "bob"}, "message": {"id": "m2", "text": " yo "}},
+            ("1", "yo", "m2", "bob"),
+        ),
+        # sender as a bare user ID string, message as a string
+        ({"sender": "123", "message": "plain"}, ("123", "plain", None, "")),
+        # messaging wrapper as list or single object
+        (
+            {"messaging": [{"sender": {"id": "9"}, "message": {"mid": "m3", "text": "z"}}]},
+            ("9", "z", "m3", ""),
+        ),
+        (
+            {"messaging": {"sender": "9", "message": {"mid": "m3", "text": "z"}}},
+            ("9", "z", "m3", ""),
+        ),
+        # items array
+        (
+            {"items": [{"from": {"id": "5", "username": "u"}, "message": {"id": "m4", "text": "q"}}]},
+            ("5", "q", "m4", "u"),
+        ),
+        # flat fields
+        ({"sender_id": "7", "text": "hello", "mid": "m5"}, ("7", "hello", "m5", "")),
+        ({"user_id": 7, "data": {"text": "dd", "id": "m6"}}, ("7", "dd", "m6", "")),
+        ({}, (None, "", None, "")),
+    ],
+)
+def test_extract_dm_fields(value, expected):
+    assert _extract_dm_fields(value) == expected
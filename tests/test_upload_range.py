@@ -0,0 +1,35 @@
+"""Tests for /uploads Range header parsing"""
+
+import pytest
+
+from web.main import _parse_range_header
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("", None),
+        ("bytes=0-99", (0, 99)),
+        ("BYTES=10-", (10, 999)),
+        # end past EOF is clamped, not rejected
+        ("bytes=900-5000", (900, 999)),
+        # suffix range: last N bytes
+        ("bytes=-100", (900, 999)),
+        ("bytes=-5000", (0, 999)),
+        # malformed or multi-range: serve the whole file
+        ("bytes=5-1", None),
+        ("bytes=-", None),
+        ("bytes=0-1,5-9", None),
+        ("items=0-1", None),
+        ("bytes=١-٢", None),
+    ],
+)
+def test_parse_range_header(header, expected):
+    assert _parse_range_header(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=-0"])
+def test_parse_range_header_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        _parse_range_header(header, 1000)
@@ -1,19 +1,25 @@
 """API route handlers for InstaForge web dashboard"""
 
 import asyncio
+import hashlib
 import json
+import re
 import yaml
 import os
 import uuid
 import shutil
+import stat
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
+from enum import Enum
 from urllib.parse import urlparse
 
 from fastapi import APIRouter, Request, HTTPException, Depends, status, UploadFile, File, Form
-from fastapi.responses import JSONResponse, FileResponse, RedirectResponse, HTMLResponse
+from fastapi.responses import JSONResponse, FileResponse, RedirectResponse, HTMLResponse, StreamingResponse
 from fastapi.concurrency import run_in_threadpool
 from pydantic import HttpUrl, BaseModel
 
@@ -58,14 +64,82 @@ try:
 except ImportError:
     get_cloudflare_url = lambda: None
 
+# Imported separately so a broken ai_dm/OpenAI stack doesn't take down the AI profile/memory endpoints
+try:
+    from src.features.ai_brain import AISettingsService
+    _AI_BRAIN_AVAILABLE = True
+except ImportError:
+    AISettingsService = None
+    _AI_BRAIN_AVAILABLE = False
+
+try:
+    from src.features.ai_dm import AIDMHandler
+    _AI_DM_AVAILABLE = True
+except ImportError:
+    AIDMHandler = None
+    _AI_DM_AVAILABLE = False
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Optional: faster JSON encoding for polled status endpoints
+
 logger = get_logger(__name__)
 
 # Absolute uploads path (matches web/main.py uploads_path for consistent file serving)
 _UPLOADS_DIR = Path(__file__).resolve().parent.parent / "uploads"
 
+# Renames contend on the target directory lock, so more threads than this don't help
+_FILE_MOVE_CONCURRENCY = 8
+
+# Batch campaign reads served from memory for up to this many seconds (writes invalidate)
+_CAMPAIGNS_CACHE_TTL = 30.0
+_CAMPAIGNS_CACHE_MAXSIZE = 256
+_campaigns_cache: Dict[Tuple[str, Optional[str]], Tuple[float, Any]] = {}
+
+# Separator for AI profile custom_rules (commas and/or newlines)
+_RULE_SPLIT = re.compile(r"[,\n]+")
+
+# Account health results younger than this are served without re-running the checks
+_HEALTH_CACHE_TTL = 10.0
+# Concurrent health checks per /accounts/status/stream request
+_HEALTH_STREAM_CONCURRENCY = 8
+
 # In-memory store for Meta OAuth tokens (temporary)
 _meta_token_store: Dict[str, Any] = {}
 
+# Media MIME types accepted by verify_url
+_IMAGE_MIME_TYPES = frozenset({"image/jpeg", "image/png", "image/gif", "image/webp"})
+_VIDEO_MIME_TYPES = frozenset({"video/mp4", "video/quicktime"})
+# Response headers echoed by verify_url unless full=true
+_VERIFY_URL_HEADERS = ("Content-Type", "Content-Length", "Content-Encoding", "Server", "Cache-Control", "Location")
+
+# Parsed accounts.yaml keyed on its mtime (see cached_load_accounts)
+_accounts_cache: Optional[Tuple[int, List[Account]]] = None
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    return str(obj)
+
+
+def _json_bytes(payload: Any) -> bytes:
+    """Serialize payload with sorted keys (stable bytes for ETags), via orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        payload, sort_keys=True, separators=(",", ":"),
+        default=_json_default,
+    ).encode("utf-8")
+
+
+def _json_response(payload: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    """JSON response serialized by _json_bytes (skips FastAPI's jsonable_encoder + json.dumps pass)."""
+    return Response(content=_json_bytes(payload), status_code=status_code, media_type="application/json", headers=headers)
+
 
 router = APIRouter(prefix="/api", tags=["api"])
 auth_router = APIRouter(prefix="/auth", tags=["auth"])
@@ -87,6 +161,42 @@ def get_app() -> InstaForgeApp:
     return _app_instance
 
 
+def cached_load_accounts() -> List[Account]:
+    """Load accounts via config_manager, reusing the last parse while accounts.yaml is unchanged."""
+    global _accounts_cache
+    try:
+        stamp = os.stat(config_manager.accounts_path).st_mtime_ns
+    except OSError:
+        _accounts_cache = None
+        return config_manager.load_accounts()
+    if _accounts_cache is not None and _accounts_cache[0] == stamp:
+        return list(_accounts_cache[1])
+    accounts = config_manager.load_accounts()
+    _accounts_cache = (stamp, accounts)
+    return list(accounts)
+
+
+def _invalidate_accounts_cache() -> None:
+    """Drop the cached accounts so the next read re-parses accounts.yaml."""
+    global _accounts_cache
+    _accounts_cache = None
+
+
+# (account_service id, accounts_version) -> first account_id, see _default_account_id
+_default_account_cache: Optional[Tuple[Tuple[int, int], Optional[str]]] = None
+
+
+def _default_account_id(app: InstaForgeApp) -> Optional[str]:
+    """Return the first configured account_id (None if no accounts), cached until accounts change."""
+    global _default_account_cache
+    service = app.account_service
+    key = (id(service), service.accounts_version)
+    if _default_account_cache is None or _default_account_cache[0] != key:
+        first_id = next(iter(service.accounts), None)
+        _default_account_cache = (key, first_id)
+    return _default_account_cache[1]
+
+
 def _is_own_server_url(url: str, request: Request) -> bool:
     """Return True if the URL points to this app's own server (same host as public base URL)."""
     try:
@@ -124,8 +234,9 @@ async def version_check():
 
 def _fetch_instagram_business_account(user_token: str) -> tuple:
     """
-    Call /me/accounts (fields=id,name,access_token,instagram_business_account), get first Page ID
-    and page access_token, then /{page_id}?fields=instagram_business_account.
+    Call /me/accounts (fields=id,name,access_token,instagram_business_account) and take the first Page's
+    ID, access_token and linked Instagram account. /{page_id}?fields=instagram_business_account is only
+    requested if /me/accounts did not include the Instagram account.
     Returns (page_id, instagram_business_account_id, page_access_token). Raises ValueError if not found.
     Uses Graph API v18.0.
     """
@@ -152,17 +263,19 @@ def _fetch_instagram_business_account(user_token: str) -> tuple:
     if not page_access_token:
         raise ValueError("Page access token not returned.")
 
-    r2 = requests.get(
-        f"{base}/{page_id}",
-        params={"fields": "instagram_business_account", "access_token": user_token},
-        timeout=30,
-    )
-    data2 = r2.json()
-    if "error" in data2:
-        err = data2["error"]
-        msg = err.get("message", str(err)) if isinstance(err, dict) else str(err)
-        raise ValueError(f"Failed to load Page details: {msg}")
-    ig = data2.get("instagram_business_account")
+    ig = first.get("instagram_business_account")
+    if not ig or not ig.get("id"):
+        r2 = requests.get(
+            f"{base}/{page_id}",
+            params={"fields": "instagram_business_account", "access_token": user_token},
+            timeout=30,
+        )
+        data2 = r2.json()
+        if "error" in data2:
+            err = data2["error"]
+            msg = err.get("message", str(err)) if isinstance(err, dict) else str(err)
+            raise ValueError(f"Failed to load Page details: {msg}")
+        ig = data2.get("instagram_business_account")
     if not ig or not ig.get("id"):
         raise ValueError(
             "No Instagram Business account linked to this Page. "
@@ -1217,11 +1330,9 @@ async def create_post(
 async def get_published_posts(request: Request, limit: int = 20, account_id: Optional[str] = None, app: InstaForgeApp = Depends(get_app)):
     """Fetch published posts from Instagram API"""
     try:
+        account_id = account_id or _default_account_id(app)
         if not account_id:
-            accounts = app.account_service.list_accounts()
-            if not accounts:
-                raise HTTPException(status_code=404, detail="No accounts configured")
-            account_id = accounts[0].account_id
+            raise HTTPException(status_code=404, detail="No accounts configured")
         
         client = app.account_service.get_client(account_id)
         media_list = await run_in_threadpool(client.get_recent_media, limit=limit)
@@ -1665,6 +1776,12 @@ async def get_warming_status(
         logger.exception("Failed to get warming status", error=str(e))
         raise HTTPException(status_code=500, detail=f"Failed to get warming status: {str(e)}")
 
+def _save_upload(src, dst: Path) -> None:
+    """Copy an uploaded file's spooled body to dst; blocking, so callers run it in the threadpool."""
+    with open(dst, "wb") as buffer:
+        shutil.copyfileobj(src, buffer, 1024 * 1024)
+
+
 @router.post("/upload")
 async def upload_files(request: Request, files: List[UploadFile] = File(...)):
     """Upload media files"""
@@ -1684,8 +1801,7 @@ async def upload_files(request: Request, files: List[UploadFile] = File(...)):
             unique_filename = f"{uuid.uuid4()}{file_ext}"
             file_path = upload_dir / unique_filename
             
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+            await run_in_threadpool(_save_upload, file.file, file_path)
             
             file_url = f"{base_url}/uploads/{unique_filename}?t={int(datetime.utcnow().timestamp())}"
             uploaded_urls.append({
@@ -1701,6 +1817,19 @@ async def upload_files(request: Request, files: List[UploadFile] = File(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to upload: {str(e)}")
 
+async def _move_files_concurrently(moves: List[Tuple[Path, Path]]) -> None:
+    """Run shutil.move for each (src, dst) pair in the threadpool, at most _FILE_MOVE_CONCURRENCY at a time."""
+    limit = asyncio.Semaphore(_FILE_MOVE_CONCURRENCY)
+
+    async def _move(src: Path, dst: Path) -> None:
+        if src == dst:
+            return
+        async with limit:
+            await run_in_threadpool(shutil.move, str(src), str(dst))
+
+    await asyncio.gather(*(_move(src, dst) for src, dst in moves))
+
+
 @router.post("/batch/upload")
 async def batch_upload(
     request: Request,
@@ -1765,8 +1894,7 @@ async def batch_upload(
             
             # Save ZIP temporarily
             temp_zip_path = campaign_upload_dir / f"temp_{uuid.uuid4()}.zip"
-            with open(temp_zip_path, "wb") as buffer:
-                shutil.copyfileobj(zip_file.file, buffer)
+            await run_in_threadpool(_save_upload, zip_file.file, temp_zip_path)
             
             # Extract ZIP
             extract_dir = campaign_upload_dir / f"extract_{uuid.uuid4()}"
@@ -1813,8 +1941,7 @@ async def batch_upload(
                 unique_filename = f"{uuid.uuid4()}{file_ext}"
                 file_path = campaign_upload_dir / unique_filename
                 
-                with open(file_path, "wb") as buffer:
-                    shutil.copyfileobj(file.file, buffer)
+                await run_in_threadpool(_save_upload, file.file, file_path)
                 
                 # Validate saved file
                 is_valid, error = validate_file(file_path)
@@ -1838,25 +1965,20 @@ async def batch_upload(
                 detail=f"Too many valid files: {len(valid_files)} (max {MAX_FILES_PER_CAMPAIGN})"
             )
         
-        # Create campaign and organize files
+        # Create campaign and organize files (the directory name is reused as the campaign ID)
         campaign_id = str(uuid.uuid4())
         campaign_dir = campaign_upload_dir / campaign_id
         campaign_dir.mkdir(exist_ok=True)
         
         # Move files to campaign directory and rename for clarity
-        organized_files = []
-        for idx, file_path in enumerate(valid_files):
-            file_ext = file_path.suffix
-            new_name = f"day_{idx:02d}{file_ext}"
-            new_path = campaign_dir / new_name
-            
-            # Move file
-            if file_path != new_path:
-                shutil.move(str(file_path), str(new_path))
-            organized_files.append(new_path)
+        moves = [
+            (file_path, campaign_dir / f"day_{idx:02d}{file_path.suffix}")
+            for idx, file_path in enumerate(valid_files)
+        ]
+        await _move_files_concurrently(moves)
+        organized_files = [new_path for _, new_path in moves]
         
         # Clean up extract directory if it exists
-        extract_parent = campaign_upload_dir / f"extract_{uuid.uuid4().hex[:8]}"
         for extract_dir in campaign_upload_dir.glob("extract_*"):
             if extract_dir.is_dir() and not any(extract_dir.iterdir()):
                 try:
@@ -1875,10 +1997,9 @@ async def batch_upload(
             hashtags=hashtags,
             base_url=base_url,
             uploads_root=_UPLOADS_DIR,
+            campaign_id=campaign_id,
         )
-        
-        # Update campaign with actual campaign_id from result
-        campaign_id = result["campaign_id"]
+        _invalidate_campaigns_cache()
         
         logger.info(
             "Batch upload completed",
@@ -1903,11 +2024,30 @@ async def batch_upload(
         logger.exception("Batch upload failed", error=str(e))
         raise HTTPException(status_code=500, detail=f"Batch upload failed: {str(e)}")
 
+def _cached_campaigns(kind: str, key: Optional[str], loader) -> Any:
+    """Return loader(key) from the TTL cache; missing campaigns (None) are not cached."""
+    now = time.monotonic()
+    hit = _campaigns_cache.get((kind, key))
+    if hit is not None and now - hit[0] < _CAMPAIGNS_CACHE_TTL:
+        return hit[1]
+    value = loader(key)
+    if value is not None:
+        if len(_campaigns_cache) >= _CAMPAIGNS_CACHE_MAXSIZE:
+            _campaigns_cache.clear()
+        _campaigns_cache[(kind, key)] = (now, value)
+    return value
+
+
+def _invalidate_campaigns_cache() -> None:
+    """Forget cached campaign reads (call after creating or changing campaigns)."""
+    _campaigns_cache.clear()
+
+
 @router.get("/batch/campaigns")
 async def get_batch_campaigns(account_id: Optional[str] = None):
     """Get all batch campaigns, optionally filtered by account_id."""
     try:
-        campaigns = get_all_campaigns(account_id=account_id)
+        campaigns = _cached_campaigns("list", account_id, lambda key: get_all_campaigns(account_id=key))
         return {"campaigns": campaigns, "count": len(campaigns)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get campaigns: {str(e)}")
@@ -1916,7 +2056,7 @@ async def get_batch_campaigns(account_id: Optional[str] = None):
 async def get_batch_campaign(campaign_id: str):
     """Get a specific batch campaign by ID."""
     try:
-        campaign = get_campaign(campaign_id)
+        campaign = _cached_campaigns("detail", campaign_id, get_campaign)
         if not campaign:
             raise HTTPException(status_code=404, detail="Campaign not found")
         return {"campaign": campaign}
@@ -1925,43 +2065,94 @@ async def get_batch_campaign(campaign_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get campaign: {str(e)}")
 
+# Shared keep-alive session for verify_url so repeat probes to a host skip the TCP/TLS handshake
+_verify_session = requests.Session()
+_verify_session.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=32))
+_verify_session.mount("http://", HTTPAdapter(pool_connections=32, pool_maxsize=32))
+
+# In-flight verify_url probes keyed on (url, full)
+_verify_inflight: Dict[Tuple[str, bool], "asyncio.Future"] = {}
+
+
+def _probe_url(url: str, headers: Dict[str, str]) -> Tuple[requests.Response, bytes]:
+    """
+    Single ranged GET (bytes=0-0) so one round trip yields the real headers.
+    Returns the closed response and, for HTML or error responses, up to 2 KB of body for a preview.
+    """
+    response = _verify_session.get(
+        url,
+        headers={**headers, "Range": "bytes=0-0"},
+        timeout=10,
+        allow_redirects=True,
+        stream=True,
+    )
+    try:
+        mime = response.headers.get("Content-Type", "").split(";", 1)[0].strip().lower()
+        body = b""
+        if mime == "text/html" or response.status_code not in (200, 206):
+            body = response.raw.read(2048, decode_content=True)
+    finally:
+        response.close()
+    return response, body
+
+
 @router.get("/test/verify-url")
-async def verify_url(url: str):
-    """Test URL accessibility with Instagram's user agent"""
+async def verify_url(url: str, full: bool = False):
+    """Test URL accessibility with Instagram's user agent (full=true returns every response header)"""
+    # Single-flight: concurrent requests for the same URL share one probe
+    key = (url, full)
+    task = _verify_inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_do_verify_url(url, full))
+        _verify_inflight[key] = task
+        task.add_done_callback(lambda _: _verify_inflight.pop(key, None))
+    return await asyncio.shield(task)
+
+
+async def _do_verify_url(url: str, full: bool) -> Dict[str, Any]:
+    """Probe url and build the verify_url response."""
     try:
         # Test with Instagram's actual user agent
         headers = {
             "User-Agent": "facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)",
             "Accept": "image/*,video/*,*/*",
         }
-        response = await run_in_threadpool(requests.head, url, headers=headers, timeout=10, allow_redirects=True)
+        response, body = await run_in_threadpool(_probe_url, url, headers)
+        status_ok = response.status_code in (200, 206)
         
         content_type = response.headers.get("Content-Type", "")
-        is_image = any(ct in content_type.lower() for ct in ["image/jpeg", "image/png", "image/gif", "image/webp"])
-        is_video = any(ct in content_type.lower() for ct in ["video/mp4", "video/quicktime"])
-        is_html = "text/html" in content_type.lower()
-        
-        # If HTML, try to get a snippet to see what error we're getting
+        mime = content_type.split(";", 1)[0].strip().lower()
+        is_image = mime in _IMAGE_MIME_TYPES
+        is_video = mime in _VIDEO_MIME_TYPES
+        is_html = mime == "text/html"
+        
+        # Ranged responses report the full size after the slash in Content-Range
+        content_length = response.headers.get("Content-Length")
+        content_range = response.headers.get("Content-Range", "")
+        if response.status_code == 206 and "/" in content_range:
+            total = content_range.rsplit("/", 1)[1].strip()
+            if total != "*":
+                content_length = total
+        
+        # If HTML or an error, the probe already read a snippet of the body
         error_preview = None
-        if is_html or response.status_code != 200:
-            try:
-                get_response = await run_in_threadpool(requests.get, url, headers=headers, timeout=5, allow_redirects=True)
-                error_preview = get_response.text[:200] if get_response.text else None
-            except Exception:
-                pass
+        if body:
+            error_preview = body.decode(response.encoding or "utf-8", errors="replace")[:200]
         
         return {
             "url": url,
             "status_code": response.status_code,
             "content_type": content_type,
-            "content_length": response.headers.get("Content-Length"),
-            "is_valid": response.status_code == 200 and (is_image or is_video),
+            "content_length": content_length,
+            "is_valid": status_ok and (is_image or is_video),
             "is_image": is_image,
             "is_video": is_video,
             "is_html": is_html,
             "error_preview": error_preview,
             "warning": "URL returns HTML instead of media" if is_html else None,
-            "all_headers": dict(response.headers),
+            "all_headers": dict(response.headers) if full else {
+                k: response.headers[k] for k in _VERIFY_URL_HEADERS if k in response.headers
+            },
         }
     except Exception as e:
         return {"url": url, "error": str(e), "is_valid": False}
@@ -1969,12 +2160,16 @@ async def verify_url(url: str):
 @router.get("/test/check-file")
 async def check_file(filename: str):
     """Check if a file exists in uploads directory"""
-    import os
-    uploads_path = _UPLOADS_DIR
-    file_path = uploads_path / filename
+    # Cheap traversal guard; nested paths such as batch/<campaign_id>/day_00.jpg stay allowed
+    if filename.startswith(("/", ".")) or "\\" in filename or ".." in filename.split("/"):
+        raise HTTPException(status_code=400, detail="Invalid filename")
+    file_path = _UPLOADS_DIR / filename
     
     try:
-        if not file_path.exists():
+        # One stat() answers exists, is-file and size
+        try:
+            stat_result = file_path.stat()
+        except FileNotFoundError:
             return {
                 "filename": filename,
                 "exists": False,
@@ -1982,7 +2177,7 @@ async def check_file(filename: str):
                 "path": str(file_path),
             }
         
-        if not file_path.is_file():
+        if not stat.S_ISREG(stat_result.st_mode):
             return {
                 "filename": filename,
                 "exists": False,
@@ -1990,7 +2185,7 @@ async def check_file(filename: str):
                 "path": str(file_path),
             }
         
-        file_size = file_path.stat().st_size
+        file_size = stat_result.st_size
         ext = file_path.suffix.lower()
         
         return {
@@ -2028,14 +2223,10 @@ async def test_ai_reply(
         AI-generated reply or error message
     """
     try:
-        from src.features.ai_dm import AIDMHandler
-        
         # Get account ID
+        account_id = account_id or _default_account_id(app)
         if not account_id:
-            accounts = app.account_service.list_accounts()
-            if not accounts:
-                raise HTTPException(status_code=404, detail="No accounts configured")
-            account_id = accounts[0].account_id
+            raise HTTPException(status_code=404, detail="No accounts configured")
         
         # Get account username
         account = app.account_service.get_account(account_id)
@@ -2043,8 +2234,16 @@ async def test_ai_reply(
         
         # Check AI DM config (default enabled when ai_dm is None)
         ai_dm_enabled = True
-        if account and hasattr(account, 'ai_dm') and account.ai_dm is not None:
-            ai_dm_enabled = getattr(account.ai_dm, 'enabled', True)
+        if account and account.ai_dm is not None:
+            ai_dm_enabled = account.ai_dm.enabled
+        
+        if not _AI_DM_AVAILABLE:
+            return {
+                "status": "error",
+                "error": "AI DM module not available. Please ensure all dependencies are installed.",
+                "reply": None,
+                "ai_dm_enabled": ai_dm_enabled,
+            }
         
         # Initialize handler
         ai_handler = AIDMHandler()
@@ -2093,19 +2292,23 @@ async def get_ai_profile(
     current_user: User = Depends(require_auth),
 ):
     """Get AI profile for an account"""
+    if not _AI_BRAIN_AVAILABLE:
+        logger.error("AI Brain module not available")
+        return {
+            "status": "error",
+            "error": "AI Brain module not available. Please ensure all dependencies are installed.",
+            "account_id": account_id,
+            "profile": None,
+        }
     try:
-        from src.features.ai_brain import AISettingsService
-        
+        account_id = account_id or _default_account_id(app)
         if not account_id:
-            accounts = app.account_service.list_accounts()
-            if not accounts:
-                return {
-                    "status": "error",
-                    "error": "No accounts configured",
-                    "account_id": None,
-                    "profile": None,
-                }
-            account_id = accounts[0].account_id
+            return {
+                "status": "error",
+                "error": "No accounts configured",
+                "account_id": None,
+                "profile": None,
+            }
         
         ai_service = AISettingsService()
         profile = ai_service.get_profile(account_id)
@@ -2115,14 +2318,6 @@ async def get_ai_profile(
             "account_id": account_id,
             "profile": profile,
         }
-    except ImportError as e:
-        logger.error("AI Brain module not available", error=str(e))
-        return {
-            "status": "error",
-            "error": "AI Brain module not available. Please ensure all dependencies are installed.",
-            "account_id": account_id,
-            "profile": None,
-        }
     except Exception as e:
         logger.exception("Failed to get AI profile", error=str(e))
         return {
@@ -2151,19 +2346,23 @@ async def update_ai_profile(
     app: InstaForgeApp = Depends(get_app),
 ):
     """Update AI profile for an account"""
+    if not _AI_BRAIN_AVAILABLE:
+        logger.error("AI Brain module not available")
+        return {
+            "status": "error",
+            "error": "AI Brain module not available. Please ensure all dependencies are installed.",
+            "account_id": account_id,
+            "profile": None,
+        }
     try:
-        from src.features.ai_brain import AISettingsService
-        
+        account_id = account_id or _default_account_id(app)
         if not account_id:
-            accounts = app.account_service.list_accounts()
-            if not accounts:
-                return {
-                    "status": "error",
-                    "error": "No accounts configured",
-                    "account_id": None,
-                    "profile": None,
-                }
-            account_id = accounts[0].account_id
+            return {
+                "status": "error",
+                "error": "No accounts configured",
+                "account_id": None,
+                "profile": None,
+            }
         
         ai_service = AISettingsService()
         
@@ -2187,7 +2386,7 @@ async def update_ai_profile(
             update_data["about_business"] = about_business
         if custom_rules is not None:
             # Parse custom rules (comma-separated or newline-separated)
-            rules = [r.strip() for r in custom_rules.replace("\n", ",").split(",") if r.strip()]
+            rules = [r for r in map(str.strip, _RULE_SPLIT.split(custom_rules)) if r]
             update_data["custom_rules"] = rules
         if custom_prompt is not None:
             update_data["custom_prompt"] = custom_prompt
@@ -2201,14 +2400,6 @@ async def update_ai_profile(
             "account_id": account_id,
             "profile": profile,
         }
-    except ImportError as e:
-        logger.error("AI Brain module not available", error=str(e))
-        return {
-            "status": "error",
-            "error": "AI Brain module not available. Please ensure all dependencies are installed.",
-            "account_id": account_id,
-            "profile": None,
-        }
     except Exception as e:
         logger.exception("Failed to update AI profile", error=str(e))
         return {
@@ -2225,19 +2416,26 @@ async def get_ai_memory_stats(
     app: InstaForgeApp = Depends(get_app),
 ):
     """Get AI memory statistics for an account"""
+    if not _AI_BRAIN_AVAILABLE:
+        logger.error("AI Brain module not available")
+        return {
+            "status": "success",
+            "account_id": account_id,
+            "stats": {
+                "total_users": 0,
+                "total_messages": 0,
+                "users_with_tags": 0,
+            },
+        }
     try:
-        from src.features.ai_brain import AISettingsService
-        
+        account_id = account_id or _default_account_id(app)
         if not account_id:
-            accounts = app.account_service.list_accounts()
-            if not accounts:
-                return {
-                    "status": "error",
-                    "error": "No accounts configured",
-                    "account_id": None,
-                    "stats": None,
-                }
-            account_id = accounts[0].account_id
+            return {
+                "status": "error",
+                "error": "No accounts configured",
+                "account_id": None,
+                "stats": None,
+            }
         
         ai_service = AISettingsService()
         stats = ai_service.get_memory_stats(account_id)
@@ -2247,17 +2445,6 @@ async def get_ai_memory_stats(
             "account_id": account_id,
             "stats": stats,
         }
-    except ImportError as e:
-        logger.error("AI Brain module not available", error=str(e))
-        return {
-            "status": "success",
-            "account_id": account_id,
-            "stats": {
-                "total_users": 0,
-                "total_messages": 0,
-                "users_with_tags": 0,
-            },
-        }
     except Exception as e:
         logger.exception("Failed to get AI memory stats", error=str(e))
         return {
@@ -2278,19 +2465,23 @@ async def reset_ai_memory(
     app: InstaForgeApp = Depends(get_app),
 ):
     """Reset AI memory for an account or specific user"""
+    if not _AI_BRAIN_AVAILABLE:
+        logger.error("AI Brain module not available")
+        return {
+            "status": "error",
+            "error": "AI Brain module not available",
+            "account_id": account_id,
+            "user_id": user_id,
+        }
     try:
-        from src.features.ai_brain import AISettingsService
-        
+        account_id = account_id or _default_account_id(app)
         if not account_id:
-            accounts = app.account_service.list_accounts()
-            if not accounts:
-                return {
-                    "status": "error",
-                    "error": "No accounts configured",
-                    "account_id": None,
-                    "user_id": user_id,
-                }
-            account_id = accounts[0].account_id
+            return {
+                "status": "error",
+                "error": "No accounts configured",
+                "account_id": None,
+                "user_id": user_id,
+            }
         
         ai_service = AISettingsService()
         success = ai_service.reset_memory(account_id, user_id)
@@ -2309,14 +2500,6 @@ async def reset_ai_memory(
             "user_id": user_id,
             "message": "Memory reset successfully",
         }
-    except ImportError as e:
-        logger.error("AI Brain module not available", error=str(e))
-        return {
-            "status": "error",
-            "error": "AI Brain module not available",
-            "account_id": account_id,
-            "user_id": user_id,
-        }
     except Exception as e:
         logger.exception("Failed to reset AI memory", error=str(e))
         return {
@@ -2336,27 +2519,25 @@ async def test_ai_dm_status(app: InstaForgeApp = Depends(get_app)):
         Status of AI DM feature for all accounts
     """
     try:
-        from src.features.ai_dm import AIDMHandler
-        
         accounts = app.account_service.list_accounts()
-        ai_handler = AIDMHandler()
+        ai_handler = AIDMHandler() if _AI_DM_AVAILABLE else None
         
         status = {
-            "openai_configured": ai_handler.is_available(),
+            "openai_configured": bool(ai_handler and ai_handler.is_available()),
             "accounts": [],
         }
         
         for account in accounts:
             ai_dm_enabled = True
-            if hasattr(account, 'ai_dm') and account.ai_dm is not None:
-                ai_dm_enabled = getattr(account.ai_dm, 'enabled', True)
+            if account.ai_dm is not None:
+                ai_dm_enabled = account.ai_dm.enabled
 
             account_status = {
                 "account_id": account.account_id,
                 "username": account.username,
                 "ai_dm_enabled": ai_dm_enabled,
-                "instagram_business_id": getattr(account, 'instagram_business_id', None),
-                "has_ai_dm_config": hasattr(account, 'ai_dm') and account.ai_dm is not None,
+                "instagram_business_id": account.instagram_business_id,
+                "has_ai_dm_config": account.ai_dm is not None,
             }
             status["accounts"].append(account_status)
         
@@ -2443,8 +2624,9 @@ async def suggest_ai_dm_reply(
         if not message:
             raise HTTPException(status_code=400, detail="message required or no messages in conversation")
     try:
-        from src.features.ai_dm import AIDMHandler
         from src.features.ai_dm.dm_inbox_store import update_suggestion
+        if not _AI_DM_AVAILABLE:
+            raise HTTPException(status_code=503, detail="AI DM module not available")
         handler = AIDMHandler()
         if not handler.is_available():
             raise HTTPException(status_code=503, detail="OpenAI not configured")
@@ -2668,9 +2850,7 @@ async def fetch_instagram_business_id(
             "username": getattr(acc, "username", None),
         }
     # Update account with the fetched ID
-    update_dict = acc.dict()
-    update_dict["instagram_business_id"] = ig_bid
-    updated = Account(**update_dict)
+    updated = acc.model_copy(update={"instagram_business_id": ig_bid})
     for i, a in enumerate(accounts):
         if a.account_id == acc.account_id:
             accounts[i] = updated
@@ -2704,9 +2884,7 @@ async def set_instagram_business_id(
     found = False
     for i, acc in enumerate(accounts):
         if acc.account_id == account_id:
-            update_dict = acc.dict()
-            update_dict["instagram_business_id"] = ig_bid
-            accounts[i] = Account(**update_dict)
+            accounts[i] = acc.model_copy(update={"instagram_business_id": ig_bid})
             found = True
             break
     if not found:
@@ -2730,11 +2908,9 @@ async def get_comment_to_dm_status(account_id: Optional[str] = None, app: InstaF
         if not app.comment_to_dm_service:
             raise HTTPException(status_code=500, detail="Service not initialized")
             
+        account_id = account_id or _default_account_id(app)
         if not account_id:
-            accounts = app.account_service.list_accounts()
-            if not accounts:
-                raise HTTPException(status_code=404, detail="No accounts configured")
-            account_id = accounts[0].account_id
+            raise HTTPException(status_code=404, detail="No accounts configured")
             
         status_info = app.comment_to_dm_service.get_status(account_id)
         return {"account_id": account_id, "status": status_info}
@@ -2747,7 +2923,7 @@ async def get_comment_to_dm_status(account_id: Optional[str] = None, app: InstaF
 async def get_comment_to_dm_config(account_id: Optional[str] = None):
     """Get comment-to-DM config"""
     try:
-        accounts = config_manager.load_accounts()
+        accounts = cached_load_accounts()
         if not account_id:
             if not accounts:
                 raise HTTPException(status_code=404, detail="No accounts found")
@@ -2777,7 +2953,7 @@ async def update_comment_to_dm_config(
     """Update comment-to-DM config"""
     try:
         body = await request.json()
-        accounts = config_manager.load_accounts()
+        accounts = cached_load_accounts()
         
         if not account_id:
             if not accounts:
@@ -2786,15 +2962,10 @@ async def update_comment_to_dm_config(
             account = accounts[0]
             account_id = account.account_id
         else:
-            found = False
-            for i, acc in enumerate(accounts):
-                if acc.account_id == account_id:
-                    account_idx = i
-                    account = acc
-                    found = True
-                    break
-            if not found:
+            by_id = {acc.account_id: (i, acc) for i, acc in enumerate(accounts)}
+            if account_id not in by_id:
                 raise HTTPException(status_code=404, detail="Account not found")
+            account_idx, account = by_id[account_id]
         
         # Update config
         new_config_data = account.comment_to_dm.dict() if account.comment_to_dm else {}
@@ -2805,16 +2976,13 @@ async def update_comment_to_dm_config(
             "link_to_send": body.get("link_to_send", ""),
         })
         
-        # Helper to filter out None values if needed, but dict() should handle defaults if we reconstruct
-        # But we need to update the account object
-        account_data = account.dict()
-        account_data['comment_to_dm'] = new_config_data
-        
-        # Validate and replace
-        updated_account = Account(**account_data)
+        # Validate only the changed sub-config and copy it onto the account
+        new_cfg = CommentToDMConfig.model_validate(new_config_data)
+        updated_account = account.model_copy(update={"comment_to_dm": new_cfg})
         accounts[account_idx] = updated_account
         
         config_manager.save_accounts(accounts)
+        _invalidate_accounts_cache()
         
         # Reload app
         app.accounts = accounts
@@ -2841,11 +3009,9 @@ async def set_post_dm_file(request: Request, media_id: str, account_id: Optional
         if not app.comment_to_dm_service:
             raise HTTPException(status_code=500, detail="Service not initialized")
 
+        account_id = account_id or _default_account_id(app)
         if not account_id:
-            accounts = app.account_service.list_accounts()
-            if not accounts:
-                raise HTTPException(status_code=404, detail="No accounts configured")
-            account_id = accounts[0].account_id
+            raise HTTPException(status_code=404, detail="No accounts configured")
 
         logger.info(
             "Saving post DM config",
@@ -2857,7 +3023,7 @@ async def set_post_dm_file(request: Request, media_id: str, account_id: Optional
             ai_enabled=ai_enabled,
         )
 
-        app.comment_to_dm_service.post_dm_config.set_post_dm_file(
+        saved_config = app.comment_to_dm_service.post_dm_config.set_post_dm_file(
             account_id=account_id,
             media_id=media_id,
             file_path=file_path,
@@ -2866,8 +3032,6 @@ async def set_post_dm_file(request: Request, media_id: str, account_id: Optional
             trigger_word=trigger_word,
             ai_enabled=ai_enabled,
         )
-
-        saved_config = app.comment_to_dm_service.post_dm_config.get_post_dm_config(account_id, media_id)
         logger.info(
             "Post DM config saved and verified",
             account_id=account_id,
@@ -2896,11 +3060,9 @@ async def get_post_dm_file(media_id: str, account_id: Optional[str] = None, app:
         if not app.comment_to_dm_service:
             raise HTTPException(status_code=500, detail="Service not initialized")
             
+        account_id = account_id or _default_account_id(app)
         if not account_id:
-            accounts = app.account_service.list_accounts()
-            if not accounts:
-                 raise HTTPException(status_code=404, detail="No accounts configured")
-            account_id = accounts[0].account_id
+            raise HTTPException(status_code=404, detail="No accounts configured")
             
         config = app.comment_to_dm_service.post_dm_config.get_post_dm_config(
             account_id=account_id,
@@ -2928,11 +3090,9 @@ async def remove_post_dm_file(media_id: str, account_id: Optional[str] = None, a
         if not app.comment_to_dm_service:
             raise HTTPException(status_code=500, detail="Service not initialized")
             
+        account_id = account_id or _default_account_id(app)
         if not account_id:
-            accounts = app.account_service.list_accounts()
-            if not accounts:
-                 raise HTTPException(status_code=404, detail="No accounts configured")
-            account_id = accounts[0].account_id
+            raise HTTPException(status_code=404, detail="No accounts configured")
             
         app.comment_to_dm_service.post_dm_config.remove_post_dm_file(
             account_id=account_id,
@@ -2945,73 +3105,161 @@ async def remove_post_dm_file(media_id: str, account_id: Optional[str] = None, a
 
 # Account Management Endpoints
 
+async def _get_account_health(app: InstaForgeApp, account_id: str, force: bool = False, safe: bool = False):
+    """Return a health result younger than _HEALTH_CACHE_TTL, running the check in the threadpool on a miss."""
+    service = app.account_health_service
+    if not force:
+        cached = service.get_recent_health(account_id, _HEALTH_CACHE_TTL)
+        if cached is not None:
+            return cached
+    check = service.check_account_health_safe if safe else service.check_account_health
+    return await run_in_threadpool(check, account_id)
+
+
+def _health_cache_headers(force: bool) -> Dict[str, str]:
+    """Cache-Control for health status responses (forced refreshes are never cached)."""
+    if force:
+        return {"Cache-Control": "no-store"}
+    return {"Cache-Control": f"private, max-age={int(_HEALTH_CACHE_TTL)}, stale-while-revalidate=30"}
+
+
+def _health_response(request: Request, payload: Dict[str, Any], force: bool) -> Response:
+    """JSON health response with an ETag; answers 304 when the client's If-None-Match still matches."""
+    body = _json_bytes(payload)
+    etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+    headers = _health_cache_headers(force)
+    headers["ETag"] = etag
+    if not force:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            if etag in candidates or "*" in candidates:
+                return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _visible_status_accounts(app: InstaForgeApp, current_user: User) -> Tuple[Dict[str, Account], List[str]]:
+    """Registered accounts by id, plus the ids current_user may see (same visibility as config/accounts)."""
+    accounts_by_id = {acc.account_id: acc for acc in app.account_service.list_accounts()}
+    account_ids = list(accounts_by_id)
+    
+    # Same visibility as get_accounts: admins see all; others see owner_id == self or None
+    try:
+        accounts = cached_load_accounts()
+        if current_user.role != "admin":
+            visible_ids = {acc.account_id for acc in accounts if getattr(acc, "owner_id", None) == current_user.id or getattr(acc, "owner_id", None) is None}
+        else:
+            visible_ids = {acc.account_id for acc in accounts}
+    except Exception as e:
+        logger.warning("Account visibility filter failed, showing all", error=str(e))
+        visible_ids = set(account_ids)
+    return accounts_by_id, [account_id for account_id in account_ids if account_id in visible_ids]
+
+
 @router.get("/accounts/status")
 async def get_accounts_status(
+    request: Request,
+    force: bool = False,
     app: InstaForgeApp = Depends(get_app),
     current_user: User = Depends(require_auth),
 ):
-    """Get health status for all accounts (filtered by ownership: same as config/accounts)"""
+    """Get health status for all accounts (filtered by ownership: same as config/accounts). force=true skips the cache."""
     try:
         if not app.account_health_service:
             raise HTTPException(status_code=500, detail="Health service not initialized")
         
-        # Run blocking health checks in thread pool so the async event loop doesn't block
-        results = await run_in_threadpool(app.account_health_service.check_all_accounts)
+        accounts_by_id, account_ids = _visible_status_accounts(app, current_user)
         
-        # Same visibility as get_accounts: admins see all; others see owner_id == self or None
-        try:
-            accounts = config_manager.load_accounts()
-            if current_user.role != "admin":
-                visible_ids = {acc.account_id for acc in accounts if getattr(acc, "owner_id", None) == current_user.id or getattr(acc, "owner_id", None) is None}
-            else:
-                visible_ids = {acc.account_id for acc in accounts}
-        except Exception as e:
-            logger.warning("Account visibility filter failed, showing all", error=str(e))
-            visible_ids = set(results.keys())
+        # Cached results are served directly; misses run concurrently in the thread pool
+        results = await asyncio.gather(
+            *(_get_account_health(app, account_id, force=force, safe=True) for account_id in account_ids)
+        )
         
         # Format response (only accounts the user is allowed to see)
-        status_list = []
-        for account_id, result in results.items():
-            if account_id not in visible_ids:
-                continue
-            try:
-                account = app.account_service.get_account(account_id)
-                status_list.append({
-                    "account_id": account_id,
-                    "username": account.username,
-                    "status": result.status.value,
-                    "checks": result.checks,
-                    "timestamp": result.timestamp.isoformat(),
-                })
-            except Exception as e:
-                logger.warning("Failed to get account info for status", account_id=account_id, error=str(e))
-                status_list.append({
+        status_list = [
+            {
+                "account_id": account_id,
+                "username": accounts_by_id[account_id].username,
+                "status": result.status.value,
+                "checks": result.checks,
+                "timestamp": result.timestamp.isoformat(),
+            }
+            for account_id, result in zip(account_ids, results)
+        ]
+        
+        return _health_response(
+            request,
+            {
+                "status": "success",
+                "accounts": status_list,
+                "total": len(status_list),
+            },
+            force,
+        )
+    except Exception as e:
+        logger.exception("Failed to get account status", error=str(e))
+        raise HTTPException(status_code=500, detail=f"Failed to get account status: {str(e)}")
+
+
+@router.get("/accounts/status/stream")
+async def stream_accounts_status(
+    force: bool = False,
+    app: InstaForgeApp = Depends(get_app),
+    current_user: User = Depends(require_auth),
+):
+    """
+    Same data as /accounts/status, streamed as NDJSON: one line per account as soon as its
+    check finishes (cached results first), then a final {"status": "success", "total": N} line.
+    """
+    if not app.account_health_service:
+        raise HTTPException(status_code=500, detail="Health service not initialized")
+    
+    accounts_by_id, account_ids = _visible_status_accounts(app, current_user)
+    limit = asyncio.Semaphore(_HEALTH_STREAM_CONCURRENCY)
+    
+    async def _check(account_id: str):
+        async with limit:
+            return account_id, await _get_account_health(app, account_id, force=force, safe=True)
+    
+    async def _lines():
+        tasks = [asyncio.ensure_future(_check(account_id)) for account_id in account_ids]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                account_id, result = await next_done
+                yield _json_bytes({
                     "account_id": account_id,
-                    "username": "Unknown",
+                    "username": accounts_by_id[account_id].username,
                     "status": result.status.value,
                     "checks": result.checks,
                     "timestamp": result.timestamp.isoformat(),
-                })
-        
-        return {
-            "status": "success",
-            "accounts": status_list,
-            "total": len(status_list),
-        }
-    except Exception as e:
-        logger.exception("Failed to get account status", error=str(e))
-        raise HTTPException(status_code=500, detail=f"Failed to get account status: {str(e)}")
+                }) + b"\n"
+            yield _json_bytes({"status": "success", "total": len(account_ids)}) + b"\n"
+        finally:
+            # Client went away mid-stream: don't leave checks queued behind the semaphore
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(
+        _lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-store"},
+    )
 
 
 @router.get("/accounts/{account_id}/status")
-async def get_account_status(account_id: str, app: InstaForgeApp = Depends(get_app)):
-    """Get health status for a specific account"""
+async def get_account_status(
+    account_id: str,
+    request: Request,
+    force: bool = False,
+    app: InstaForgeApp = Depends(get_app),
+):
+    """Get health status for a specific account (force=true skips the cache; supports If-None-Match)"""
     try:
         if not app.account_health_service:
             raise HTTPException(status_code=500, detail="Health service not initialized")
         
         # Check health for this account
-        result = app.account_health_service.check_account_health(account_id)
+        result = await _get_account_health(app, account_id, force=force)
         
         try:
             account = app.account_service.get_account(account_id)
@@ -3019,14 +3267,18 @@ async def get_account_status(account_id: str, app: InstaForgeApp = Depends(get_a
         except Exception:
             username = "Unknown"
         
-        return {
-            "status": "success",
-            "account_id": account_id,
-            "username": username,
-            "health_status": result.status.value,
-            "checks": result.checks,
-            "timestamp": result.timestamp.isoformat(),
-        }
+        return _health_response(
+            request,
+            {
+                "status": "success",
+                "account_id": account_id,
+                "username": username,
+                "health_status": result.status.value,
+                "checks": result.checks,
+                "timestamp": result.timestamp.isoformat(),
+            },
+            force,
+        )
     except Exception as e:
         logger.exception("Failed to get account status", account_id=account_id, error=str(e))
         raise HTTPException(status_code=500, detail=f"Failed to get account status: {str(e)}")
@@ -3045,10 +3297,10 @@ async def onboard_account(account_id: str, app: InstaForgeApp = Depends(get_app)
         # Run onboarding
         result = app.account_onboarding_service.onboard_account(account, app_instance=app)
         
-        return {
+        return _json_response({
             "status": "success",
             "onboarding_result": result.to_dict(),
-        }
+        })
     except Exception as e:
         logger.exception("Failed to onboard account", account_id=account_id, error=str(e))
         raise HTTPException(status_code=500, detail=f"Failed to onboard account: {str(e)}")
@@ -3063,10 +3315,10 @@ async def reload_accounts(
     try:
         results = app.reload_accounts()
         
-        return {
+        return _json_response({
             "status": "success",
             "results": results,
-        }
+        })
     except Exception as e:
         logger.exception("Failed to reload accounts", error=str(e))
         raise HTTPException(status_code=500, detail=f"Failed to reload accounts: {str(e)}")
@@ -28,8 +28,13 @@ def get_session_token(request: Request) -> Optional[str]:
     return None
 
 
-async def get_current_user(request: Request) -> User:
-    """Dependency to get current authenticated user"""
+def get_current_user(request: Request) -> User:
+    """
+    Dependency to get current authenticated user.
+    
+    Sync on purpose: validate_session may read sessions.json or Redis, and FastAPI
+    runs sync dependencies in the threadpool instead of blocking the event loop.
+    """
     token = get_session_token(request)
     
     if not token:
@@ -1,20 +1,53 @@
 """Cloudflare Tunnel helper for automatic tunnel creation"""
 
 import os
+import functools
 import subprocess
-import time
+import threading
 import re
+from collections import deque
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, Optional
 
 # Global Cloudflare tunnel URL
 _cloudflare_url: Optional[str] = None
 _cloudflare_process: Optional[subprocess.Popen] = None
+# _cloudflare_url without trailing slash, kept in sync so URL builders skip the rstrip
+_cloudflare_url_normalized: str = ""
+
+# Tunnel URL formats printed by cloudflared: quick tunnels (incl. the older
+# name--name form) and named tunnels on cfargotunnel.com
+_CF_URL_RE = re.compile(
+    r"https://(?:[a-zA-Z0-9-]+\.trycloudflare\.com|[a-zA-Z0-9-]+\.cfargotunnel\.com)"
+)
+
+
+def _extract_tunnel_url(line: str) -> Optional[str]:
+    """Return the public tunnel URL from a line of cloudflared output, if present"""
+    match = _CF_URL_RE.search(line)
+    return match.group(0) if match else None
+
+
+def _read_cloudflared_output(pipe, found: Dict[str, Any], url_event: threading.Event) -> None:
+    """Echo cloudflared output until EOF; set url_event once the tunnel URL is seen (or the process exits)"""
+    try:
+        for line in iter(pipe.readline, ""):
+            found["output"].append(line)
+            print(f"cloudflared: {line.strip()}", flush=True)
+            if found["url"] is None and "https://" in line:
+                url = _extract_tunnel_url(line)
+                if url:
+                    found["url"] = url
+                    url_event.set()
+    except Exception:
+        pass
+    finally:
+        url_event.set()
 
 
 def start_cloudflare(port: int = 8000) -> Optional[str]:
     """Start Cloudflare tunnel and return the public URL"""
-    global _cloudflare_url, _cloudflare_process
+    global _cloudflare_url, _cloudflare_url_normalized, _cloudflare_process
     
     try:
         # Start cloudflared tunnel
@@ -28,66 +61,29 @@ def start_cloudflare(port: int = 8000) -> Optional[str]:
         )
         _cloudflare_process = process
         
-        # Wait for tunnel to start and extract URL
-        url = None
+        # Wait for tunnel to start and extract URL. A reader thread drains stdout
+        # (so cloudflared never blocks on a full pipe) and signals as soon as the URL appears.
         max_wait = 10  # Wait up to 10 seconds
-        waited = 0
-        
-        # Read output line by line
-        while waited < max_wait and not url:
-            if process.poll() is not None:
-                # Process exited, check return code
-                if process.returncode != 0:
-                    output = process.stdout.read() if process.stdout else ""
-                    raise Exception(f"cloudflared exited with code {process.returncode}. Output: {output}")
-                break
-            
-            # Try to read a line (non-blocking)
-            line = None
-            try:
-                if process.stdout:
-                    line = process.stdout.readline()
-            except Exception:
-                pass
-            
-            if line:
-                print(f"cloudflared: {line.strip()}", flush=True)
-                # Look for URL in output
-                if "https://" in line:
-                    # Extract URL from cloudflared output
-                    match = re.search(r'https://[a-zA-Z0-9-]+\.trycloudflare\.com', line)
-                    if match:
-                        url = match.group(0)
-                        break
-                    # Alternative format (some versions)
-                    match = re.search(r'https://[a-zA-Z0-9-]+\.cfargotunnel\.com', line)
-                    if match:
-                        url = match.group(0)
-                        break
-                    # Another possible format
-                    match = re.search(r'https://[a-z0-9-]+--[a-z0-9-]+\.trycloudflare\.com', line)
-                    if match:
-                        url = match.group(0)
-                        break
-            
-            if not url:
-                time.sleep(0.5)
-                waited += 0.5
+        found = {"url": None, "output": deque(maxlen=50)}
+        url_event = threading.Event()
+        if process.stdout:
+            threading.Thread(
+                target=_read_cloudflared_output,
+                args=(process.stdout, found, url_event),
+                daemon=True,
+                name="cloudflared-stdout",
+            ).start()
+        url_event.wait(timeout=max_wait)
+        url = found["url"]
         
         if not url:
-            # Try one more time to read all output
-            if process.stdout:
-                remaining = process.stdout.read()
-                if remaining:
-                    print(f"cloudflared output: {remaining}")
-                    match = re.search(r'https://[a-zA-Z0-9-]+\.trycloudflare\.com', remaining)
-                    if match:
-                        url = match.group(0)
-            
-            if not url:
-                raise Exception("Could not extract Cloudflare tunnel URL from output. Make sure cloudflared is installed and working.")
+            if process.poll() is not None and process.returncode != 0:
+                output = "".join(found["output"])
+                raise Exception(f"cloudflared exited with code {process.returncode}. Output: {output}")
+            raise Exception("Could not extract Cloudflare tunnel URL from output. Make sure cloudflared is installed and working.")
         
         _cloudflare_url = url
+        _cloudflare_url_normalized = url.rstrip("/")
         
         print(f"\n{'='*60}")
         print(f"Cloudflare Tunnel started successfully!")
@@ -117,7 +113,7 @@ def start_cloudflare(port: int = 8000) -> Optional[str]:
 
 def stop_cloudflare():
     """Stop Cloudflare tunnel"""
-    global _cloudflare_url, _cloudflare_process
+    global _cloudflare_url, _cloudflare_url_normalized, _cloudflare_process
     
     if _cloudflare_process:
         try:
@@ -131,6 +127,7 @@ def stop_cloudflare():
         finally:
             _cloudflare_process = None
             _cloudflare_url = None
+            _cloudflare_url_normalized = ""
             print("\nCloudflare tunnel stopped.")
 
 
@@ -139,6 +136,21 @@ def get_cloudflare_url() -> Optional[str]:
     return _cloudflare_url
 
 
+@functools.lru_cache(maxsize=1)
+def _static_base_url() -> str:
+    """BASE_URL/APP_URL when ENVIRONMENT=production, else "". Environment is fixed for the process, so resolve once."""
+    env = (os.getenv("ENVIRONMENT") or "development").strip().lower()
+    if env != "production":
+        return ""
+    return (os.getenv("BASE_URL") or os.getenv("APP_URL") or "").strip().rstrip("/")
+
+
+@functools.lru_cache(maxsize=32)
+def _base_from_proxy(proto: str, host: str) -> str:
+    """Base URL from X-Forwarded-Proto / X-Forwarded-Host (first host if the proxy chain appended several)"""
+    return f"{proto.strip()}://{host.split(',')[0].strip()}".rstrip("/")
+
+
 def get_current_public_base_url() -> str:
     """
     Return current public base URL for background use (no request).
@@ -149,16 +161,7 @@ def get_current_public_base_url() -> str:
       This prevents a dev machine from generating URLs like https://veilforce.com/uploads/...
       when the actual files only exist on the dev machine.
     """
-    env = (os.getenv("ENVIRONMENT") or "development").strip().lower()
-    base = None
-    if env == "production":
-        base = os.getenv("BASE_URL") or os.getenv("APP_URL")
-    if base:
-        return (base or "").strip().rstrip("/")
-    global _cloudflare_url
-    if _cloudflare_url:
-        return _cloudflare_url.rstrip("/")
-    return ""
+    return _static_base_url() or _cloudflare_url_normalized
 
 
 def get_base_url(request_base_url: str = "", request_headers=None) -> str:
@@ -171,25 +174,21 @@ def get_base_url(request_base_url: str = "", request_headers=None) -> str:
       This avoids dev instances writing URLs like https://veilforce.com/uploads/... that do not exist
       on the veilforce.com server.
     """
-    env = (os.getenv("ENVIRONMENT") or "development").strip().lower()
-
     # 1) Production: use BASE_URL or APP_URL (your public HTTPS domain)
-    if env == "production":
-        base = os.getenv("BASE_URL") or os.getenv("APP_URL")
-        if base:
-            return base.strip().rstrip("/")
+    static_base = _static_base_url()
+    if static_base:
+        return static_base
 
     # 2) Behind a proxy (Render, Heroku, nginx): use X-Forwarded-Proto + X-Forwarded-Host
     if request_headers:
         proto = request_headers.get("X-Forwarded-Proto") or request_headers.get("X-Forwarded-Protocol")
         host = request_headers.get("X-Forwarded-Host") or request_headers.get("Host")
         if proto and host:
-            return f"{proto.strip()}://{host.split(',')[0].strip()}".rstrip("/")
+            return _base_from_proxy(proto, host)
 
     # 3) Development: use Cloudflare tunnel if available
-    global _cloudflare_url
-    if _cloudflare_url:
-        return _cloudflare_url.rstrip("/")
+    if _cloudflare_url_normalized:
+        return _cloudflare_url_normalized
 
     # 4) Fallback: request URL (e.g. http://localhost:8000)
     if request_base_url:
@@ -1,9 +1,13 @@
 """Cloudinary helper for uploading media files"""
 
 import os
-from typing import Optional
+from typing import Optional, Tuple
 from pathlib import Path
 
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
 # Load environment variables from .env file
 try:
     from dotenv import load_dotenv
@@ -20,8 +24,19 @@ try:
 except ImportError:
     CLOUDINARY_AVAILABLE = False
 
-def init_cloudinary():
-    """Initialize Cloudinary with credentials from environment variables"""
+_IMAGE_EXTS = frozenset({".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".ico"})
+_VIDEO_EXTS = frozenset({".mp4", ".mov", ".avi", ".webm", ".flv", ".mkv"})
+
+# (cloud_name, api_key, api_secret) once init_cloudinary() has succeeded; until then the
+# environment is re-checked on each call, so credentials loaded later are still picked up
+_config: Optional[Tuple[str, str, str]] = None
+
+
+def init_cloudinary() -> bool:
+    """Initialize Cloudinary with credentials from environment variables (configures it once per process)"""
+    global _config
+    if _config is not None:
+        return True
     if not CLOUDINARY_AVAILABLE:
         return False
     
@@ -32,6 +47,7 @@ def init_cloudinary():
     if not cloud_name or not api_key or not api_secret:
         return False
     
+    _config = (cloud_name, api_key, api_secret)
     cloudinary.config(
         cloud_name=cloud_name,
         api_key=api_key,
@@ -52,10 +68,7 @@ def upload_to_cloudinary(file_path: Path, public_id: Optional[str] = None) -> Op
     Returns:
         Public HTTPS URL of the uploaded file, or None if upload fails
     """
-    if not CLOUDINARY_AVAILABLE:
-        return None
-    
-    if not init_cloudinary():
+    if _config is None and not init_cloudinary():
         return None
     
     try:
@@ -63,13 +76,13 @@ def upload_to_cloudinary(file_path: Path, public_id: Optional[str] = None) -> Op
         ext = file_path.suffix.lower()
         resource_type = "auto"  # Cloudinary auto-detects
         
-        if ext in [".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".ico"]:
+        if ext in _IMAGE_EXTS:
             resource_type = "image"
-        elif ext in [".mp4", ".mov", ".avi", ".webm", ".flv", ".mkv"]:
+        elif ext in _VIDEO_EXTS:
             resource_type = "video"
         
         # Upload to Cloudinary
-        print(f"DEBUG: Uploading to Cloudinary: {file_path}, resource_type={resource_type}, public_id={public_id}")
+        logger.debug("Uploading to Cloudinary", file_path=str(file_path), resource_type=resource_type, public_id=public_id)
         
         result = cloudinary.uploader.upload(
             str(file_path),
@@ -82,22 +95,13 @@ def upload_to_cloudinary(file_path: Path, public_id: Optional[str] = None) -> Op
         
         # Return the secure HTTPS URL
         url = result.get("secure_url") or result.get("url")
-        print(f"DEBUG: Cloudinary upload successful: {url}")
+        logger.debug("Cloudinary upload successful", url=url)
         return url
         
     except Exception as e:
-        import traceback
-        print(f"ERROR: Failed to upload to Cloudinary: {e}")
-        print(f"ERROR: Traceback: {traceback.format_exc()}")
+        logger.exception("Failed to upload to Cloudinary", file_path=str(file_path), error=str(e))
         return None
 
 def is_cloudinary_configured() -> bool:
     """Check if Cloudinary is configured"""
-    if not CLOUDINARY_AVAILABLE:
-        return False
-    
-    cloud_name = os.getenv("CLOUDINARY_CLOUD_NAME")
-    api_key = os.getenv("CLOUDINARY_API_KEY")
-    api_secret = os.getenv("CLOUDINARY_API_SECRET")
-    
-    return bool(cloud_name and api_key and api_secret)
+    return _config is not None or init_cloudinary()
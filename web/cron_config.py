@@ -29,6 +29,9 @@ TOKEN_REFRESH_INTERVAL_SECONDS = _int_env("TOKEN_REFRESH_INTERVAL_SECONDS", 8640
 # Account health: check every N seconds.
 ACCOUNT_HEALTH_INTERVAL_SECONDS = _int_env("ACCOUNT_HEALTH_INTERVAL_SECONDS", 600)  # 10 min
 
+# Session sweeper: remove expired login sessions every N seconds.
+SESSION_SWEEP_INTERVAL_SECONDS = _int_env("SESSION_SWEEP_INTERVAL_SECONDS", 60)
+
 # Frontend auto-refresh (inbox, schedule, accounts): recommend 60s+ to avoid rate limits.
 # These are hints for the UI; actual timers are in JS.
 INBOX_REFRESH_INTERVAL_SECONDS = _int_env("INBOX_REFRESH_INTERVAL_SECONDS", 60)
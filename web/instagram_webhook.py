@@ -1,15 +1,139 @@
 """Instagram webhook parsing and forwarding. Logs all payloads, forwards comments/messages to existing services."""
 
-from typing import Any, Dict, List, Optional
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
 
 from src.utils.logger import get_logger
 from src.utils.exceptions import AccountError
-from src.features.ai_dm import AIDMHandler
-from src.features.ai_dm.dm_inbox_store import add_message as inbox_add_message, update_suggestion as inbox_update_suggestion, mark_sent as inbox_mark_sent
+from src.features.ai_dm.dm_inbox_store import apply_updates as inbox_apply
 from src.features.dm_onboarding_handler import handle_onboarding_dm
 from src.features.dm_onboarding_store import get_session
 
 logger = get_logger(__name__)
+# stdlib logger behind the structlog one, for cheap level checks
+_std_logger = logging.getLogger(__name__)
+
+# Webhook change fields carrying comments
+_COMMENT_FIELDS = frozenset({"comments", "live_comments"})
+
+# Graph API send error codes meaning a missing permission or unknown recipient
+_PERMISSION_ERROR_CODES = frozenset({100, 200})
+
+# DM onboarding steps during which the AI DM reply must not take over the conversation
+_ONBOARDING_ACTIVE_STEPS = frozenset({
+    "awaiting_email_or_mobile",
+    "awaiting_store_name",
+    "awaiting_currency",
+    "confirming",
+})
+
+# DM processing (OpenAI + Instagram send) and comment-to-DM forwarding run on a worker pool
+# so the webhook can ack Meta immediately. At most _DM_WORKERS + _DM_BACKLOG_LIMIT jobs are
+# in flight; beyond that new ones are dropped with a warning rather than queueing without bound.
+_DM_WORKERS = int(os.getenv("WEBHOOK_DM_WORKERS", "8"))
+_DM_BACKLOG_LIMIT = int(os.getenv("WEBHOOK_DM_BACKLOG", "256"))
+_dm_executor = ThreadPoolExecutor(max_workers=_DM_WORKERS, thread_name_prefix="webhook-dm")
+_dm_slots = threading.BoundedSemaphore(_DM_WORKERS + _DM_BACKLOG_LIMIT)
+
+
+
+class _SeenKeys:
+    """Thread-safe, size-bounded set of keys that forgets each key ttl seconds after it was added."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._expiry: "OrderedDict[Any, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, key: Any) -> bool:
+        """Record key. Returns False if it was already recorded within the last ttl seconds."""
+        now = time.monotonic()
+        with self._lock:
+            # Entries are in insertion order, so expired ones are at the front
+            while self._expiry:
+                oldest_key, expires = next(iter(self._expiry.items()))
+                if expires > now and len(self._expiry) < self.maxsize:
+                    break
+                del self._expiry[oldest_key]
+            if key in self._expiry:
+                return False
+            self._expiry[key] = now + self.ttl
+            return True
+
+    def forget(self, key: Any) -> None:
+        with self._lock:
+            self._expiry.pop(key, None)
+
+
+class _TracebackLimiter:
+    """Per-key token bucket: allows `burst` tracebacks at once, refilled at `rate` per second."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[Any, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key: Any) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+            allowed = tokens >= 1.0
+            self._buckets[key] = (tokens - 1.0 if allowed else tokens, now)
+            return allowed
+
+
+# During upstream outages the same failure repeats for every DM; beyond the limit errors are
+# still logged, but without the (costly) traceback
+_traceback_limiter = _TracebackLimiter(rate=10.0, burst=20)
+
+
+def _log_exception(event: str, **fields: Any) -> None:
+    """logger.exception, rate limited per (event, action, error_type); over the limit logs the error without traceback."""
+    if _traceback_limiter.allow((event, fields.get("action"), fields.get("error_type"))):
+        logger.exception(event, **fields)
+    else:
+        logger.error(event, traceback_suppressed=True, **fields)
+
+
+# Meta delivers webhooks at least once; these make redeliveries of the same DM / comment no-ops
+_seen_dm_ids = _SeenKeys(maxsize=100_000, ttl=3600)
+_seen_comment_ids = _SeenKeys(maxsize=10_000, ttl=3600)
+
+# (account_id, media_id) -> (monotonic deadline, caption). Comment bursts on one post reuse the
+# caption; concurrent misses for the same post wait on one Graph API fetch (per-key lock).
+_CAPTION_TTL = 3600.0
+_CAPTION_CACHE_MAXSIZE = 10_000
+_caption_cache: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+_caption_cache_lock = threading.Lock()
+_caption_fetch_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+# ig_business_id / account_id -> account lookup, keyed on (id(account_service), accounts_version)
+_ig_id_index: Dict[str, Tuple[str, str, str]] = {}
+_ig_id_fallback: Optional[Tuple[str, str]] = None
+_ig_id_index_key: Optional[Tuple[int, Optional[int]]] = None
+
+
+def _dict_keys(value: Any) -> Optional[List[str]]:
+    """Keys of value for log fields, or None if it isn't a dict."""
+    return list(value) if isinstance(value, dict) else None
+
+
+def _payload_debug_fields(value: Any) -> Dict[str, Any]:
+    """value_keys/value_preview log fields, built only when DEBUG logging is enabled."""
+    if not _std_logger.isEnabledFor(logging.DEBUG):
+        return {}
+    return {
+        "value_keys": _dict_keys(value),
+        "value_preview": str(value)[:500] if isinstance(value, dict) else str(value)[:200],
+    }
 
 
 def _normalize_payload(body: Any) -> Dict[str, Any]:
@@ -19,6 +143,31 @@ def _normalize_payload(body: Any) -> Dict[str, Any]:
     return body if isinstance(body, dict) else {}
 
 
+def _ig_id_index_for(service: Any) -> Tuple[Dict[str, Tuple[str, str, str]], Optional[Tuple[str, str]]]:
+    """
+    Return (index, fallback): index maps instagram_business_id and account_id ->
+    (account_id, username, matched_by); fallback is (account_id, username) of the only
+    account when exactly one is configured. Rebuilt only when accounts_version changes.
+    """
+    global _ig_id_index, _ig_id_fallback, _ig_id_index_key
+    version = getattr(service, "accounts_version", None)
+    key = (id(service), version)
+    if version is not None and key == _ig_id_index_key:
+        return _ig_id_index, _ig_id_fallback
+    
+    accounts = service.list_accounts()
+    index: Dict[str, Tuple[str, str, str]] = {}
+    # Reverse so the first account in list order wins, same as a front-to-back scan
+    for acc in reversed(accounts):
+        index[acc.account_id] = (acc.account_id, acc.username, "account_id")
+        if acc.instagram_business_id:
+            index[acc.instagram_business_id] = (acc.account_id, acc.username, "instagram_business_id")
+    _ig_id_index = index
+    _ig_id_fallback = (accounts[0].account_id, accounts[0].username) if len(accounts) == 1 else None
+    _ig_id_index_key = key
+    return index, _ig_id_fallback
+
+
 def _account_id_for_ig_business(ig_business_id: str, app: Any) -> Optional[str]:
     """Resolve InstaForge account_id from Instagram business account ID."""
     if not app or not getattr(app, "account_service", None):
@@ -29,60 +178,53 @@ def _account_id_for_ig_business(ig_business_id: str, app: Any) -> Optional[str]:
         )
         return None
     
-    accounts = app.account_service.list_accounts()
-    logger.debug(
-        "Webhook account resolution",
-        ig_business_id=ig_business_id,
-        total_accounts=len(accounts),
-    )
-    
-    for acc in accounts:
-        # Try matching by instagram_business_id first
-        if getattr(acc, "instagram_business_id", None) == ig_business_id:
-            logger.info(
-                "Webhook account matched by instagram_business_id",
-                ig_business_id=ig_business_id,
-                account_id=acc.account_id,
-                username=acc.username,
-            )
-            return acc.account_id
-        # Fallback: try matching by account_id (in case they're the same)
-        if acc.account_id == ig_business_id:
-            logger.info(
-                "Webhook account matched by account_id",
-                ig_business_id=ig_business_id,
-                account_id=acc.account_id,
-                username=acc.username,
-            )
-            return acc.account_id
-    
-    # If no match found, log available accounts for debugging
-    logger.warning(
-        "Webhook account not found",
-        ig_business_id=ig_business_id,
-        available_account_ids=[acc.account_id for acc in accounts],
-        available_instagram_business_ids=[
-            getattr(acc, "instagram_business_id", None) for acc in accounts
-        ],
-    )
+    index, fallback = _ig_id_index_for(app.account_service)
+    hit = index.get(ig_business_id)
+    if hit is not None:
+        account_id, username, matched_by = hit
+        logger.info(
+            "Webhook account matched",
+            matched_by=matched_by,
+            ig_business_id=ig_business_id,
+            account_id=account_id,
+            username=username,
+        )
+        return account_id
     
     # Last resort: if only one account exists, use it (for development/testing)
-    if len(accounts) == 1:
+    if fallback is not None:
         logger.info(
             "Webhook using single account as fallback",
             ig_business_id=ig_business_id,
-            account_id=accounts[0].account_id,
-            username=accounts[0].username,
+            account_id=fallback[0],
+            username=fallback[1],
         )
-        return accounts[0].account_id
+        return fallback[0]
     
+    # If no match found, log available accounts (id lists only when DEBUG is enabled)
+    accounts = app.account_service.list_accounts()
+    debug_fields: Dict[str, Any] = {}
+    if _std_logger.isEnabledFor(logging.DEBUG):
+        debug_fields["available_account_ids"] = [acc.account_id for acc in accounts]
+        debug_fields["available_instagram_business_ids"] = [acc.instagram_business_id for acc in accounts]
+    logger.warning(
+        "Webhook account not found",
+        ig_business_id=ig_business_id,
+        account_count=len(accounts),
+        **debug_fields,
+    )
     return None
 
 
 def _webhook_comment_to_service_format(value: Dict[str, Any]) -> Dict[str, Any]:
     """Map webhook comment value to shape expected by process_new_comments_for_dm (id, text, username, from)."""
-    from_obj = value.get("from") or {}
-    media_obj = value.get("media") or {}
+    # Normalized once to dicts so the field reads below need no further guards
+    from_obj = value.get("from")
+    if not isinstance(from_obj, dict):
+        from_obj = {}
+    media_obj = value.get("media")
+    if not isinstance(media_obj, dict):
+        media_obj = {}
     return {
         "id": value.get("id"),
         "text": value.get("text") or "",
@@ -92,30 +234,142 @@ def _webhook_comment_to_service_format(value: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-def _media_id_from_comment_value(value: Dict[str, Any]) -> Optional[str]:
-    """Get media ID from a comment change value."""
-    media = value.get("media")
-    if isinstance(media, dict) and media.get("id"):
-        return str(media["id"])
+# Where each DM field can live across Instagram webhook formats, in priority order:
+# value itself ({from|sender, message}), a messaging wrapper ({messaging: [{sender, message}]}),
+# an items array ({items: [{from, message}]}), a data object, or flat fields on value.
+# An int step indexes a list; a bare dict in its place is treated as a one-item list.
+_USER_ID_PATHS = (
+    ("from", "id"), ("from", "user_id"), ("from",),
+    ("sender", "id"), ("sender", "user_id"), ("sender",),
+    ("messaging", 0, "sender", "id"), ("messaging", 0, "sender"),
+    ("messaging", 0, "from", "id"), ("messaging", 0, "from"),
+    ("items", 0, "from", "id"), ("items", 0, "from"),
+    ("sender_id",), ("from_id",), ("user_id",),
+)
+_TEXT_PATHS = (
+    ("message", "text"), ("message", "message"), ("message",),
+    ("messaging", 0, "message", "text"), ("messaging", 0, "message", "message"), ("messaging", 0, "message"),
+    ("items", 0, "message", "text"), ("items", 0, "message", "message"), ("items", 0, "message"),
+    ("data", "text"), ("data", "message"),
+    ("text",),
+)
+_MESSAGE_ID_PATHS = (
+    ("message", "id"), ("message", "message_id"), ("message", "mid"),
+    ("messaging", 0, "message", "id"), ("messaging", 0, "message", "message_id"), ("messaging", 0, "message", "mid"),
+    ("items", 0, "message", "id"), ("items", 0, "message", "message_id"), ("items", 0, "message", "mid"),
+    ("data", "id"), ("data", "message_id"), ("data", "mid"),
+    ("id",), ("message_id",), ("mid",),
+)
+_USERNAME_PATHS = (
+    ("from", "username"), ("from", "name"),
+    ("sender", "username"), ("sender", "name"),
+    ("messaging", 0, "sender", "username"), ("messaging", 0, "sender", "name"),
+    ("messaging", 0, "from", "username"), ("messaging", 0, "from", "name"),
+    ("items", 0, "from", "username"), ("items", 0, "from", "name"),
+)
+
+_DM_PATH_TABLES = (_USER_ID_PATHS, _TEXT_PATHS, _MESSAGE_ID_PATHS, _USERNAME_PATHS)
+# Top-level keys any path starts from; a payload's subset of these is its "shape"
+_DM_SHAPE_KEYS = frozenset(path[0] for table in _DM_PATH_TABLES for path in table)
+# shape -> path tables pruned to the paths that can match it (an account usually sends one shape)
+_dm_paths_by_shape: Dict[frozenset, Tuple[Tuple[Tuple[Any, ...], ...], ...]] = {}
+
+
+def _dm_paths_for(value: Dict[str, Any]) -> Tuple[Tuple[Tuple[Any, ...], ...], ...]:
+    """Return (user_id, text, message_id, username) path tables specialized to value's top-level keys."""
+    shape = _DM_SHAPE_KEYS.intersection(value)
+    tables = _dm_paths_by_shape.get(shape)
+    if tables is None:
+        tables = tuple(tuple(path for path in table if path[0] in shape) for table in _DM_PATH_TABLES)
+        _dm_paths_by_shape[shape] = tables
+    return tables
+
+
+def _first(value: Dict[str, Any], paths: Tuple[Tuple[Any, ...], ...]) -> Optional[str]:
+    """Return the first non-blank scalar found at any of paths (stripped, as str), else None."""
+    for path in paths:
+        cur: Any = value
+        for step in path:
+            if isinstance(step, int):
+                if isinstance(cur, list):
+                    cur = cur[step] if len(cur) > step else None
+                elif not isinstance(cur, dict):
+                    cur = None
+            elif isinstance(cur, dict):
+                cur = cur.get(step)
+            else:
+                cur = None
+            if cur is None:
+                break
+        if isinstance(cur, (str, int)) and not isinstance(cur, bool):
+            found = str(cur).strip()
+            if found:
+                return found
     return None
 
 
+class _DMFields(NamedTuple):
+    """Fields of an incoming DM, independent of the payload shape it arrived in."""
+    user_id: Optional[str]
+    message_text: str
+    message_id: Optional[str]
+    username: str
+
+
+def _extract_dm_fields(value: Dict[str, Any]) -> _DMFields:
+    """Pull the DM fields out of any supported DM payload shape (no side effects)."""
+    user_id_paths, text_paths, message_id_paths, username_paths = _dm_paths_for(value)
+    message_text = _first(value, text_paths)
+    if message_text is None:
+        # Non-text message objects (e.g. attachments only) are passed on as their string form
+        raw = value.get("text") or value.get("message")
+        message_text = str(raw).strip() if raw is not None else ""
+    return _DMFields(
+        user_id=_first(value, user_id_paths),
+        message_text=message_text,
+        message_id=_first(value, message_id_paths),
+        username=_first(value, username_paths) or "",
+    )
+
+
 def _process_incoming_dm_for_ai_reply(account_id: str, value: Dict[str, Any], app: Any) -> None:
     """
     Process incoming DM and send AI-generated reply if enabled.
     
+    Per-stage trace fields are collected into one dict and logged as a single
+    DEBUG record when processing ends; warnings and outcomes are logged as they happen.
+    Inbox changes for the DM (message, AI suggestion, sent) are likewise collected
+    and written to the inbox store once at the end.
+    
     Args:
         account_id: Account identifier
         value: Webhook message value payload
         app: InstaForge app instance
     """
-    logger.info(
-        "AI_DM_WEBHOOK",
-        action="processing_start",
-        account_id=account_id,
-        value_structure=list(value.keys()) if isinstance(value, dict) else "not_dict",
-    )
-    
+    trace: Dict[str, Any] = {"stage": "processing_start"}
+    inbox: Dict[str, Any] = {}
+    try:
+        _handle_incoming_dm(account_id, value, app, trace, inbox)
+    finally:
+        if inbox:
+            try:
+                inbox_apply(account_id, inbox.pop("user_id"), **inbox)
+            except Exception as e:
+                logger.warning("DM inbox store failed", error=str(e), account_id=account_id)
+        if _std_logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "AI_DM_WEBHOOK",
+                action="trace",
+                account_id=account_id,
+                **trace,
+                **_payload_debug_fields(value),
+            )
+
+
+def _handle_incoming_dm(
+    account_id: str, value: Dict[str, Any], app: Any, trace: Dict[str, Any], inbox: Dict[str, Any]
+) -> None:
+    """Body of _process_incoming_dm_for_ai_reply; records progress in trace and inbox changes in inbox."""
     # Validate app instance and services
     if not app:
         logger.error(
@@ -157,147 +411,28 @@ def _process_incoming_dm_for_ai_reply(account_id: str, value: Dict[str, Any], ap
         )
         return
     
-    # Extract message data from webhook payload (before ai_dm check - needed for inbox store)
-    # Instagram webhook structure can vary:
-    # Option 1: value contains "from" and "message" directly
-    # Option 2: value contains "messaging" -> "sender" and "message"
-    # Option 3: value contains items array with messages
-    # Option 4: value is the message itself with nested structure
-    
-    logger.debug(
-        "AI_DM_WEBHOOK",
-        action="parsing_payload",
-        account_id=account_id,
-        value_type=type(value).__name__,
-        value_keys=list(value.keys()) if isinstance(value, dict) else None,
-        value_preview=str(value)[:500] if isinstance(value, dict) else str(value)[:200],
-    )
-    
-    # Instagram sends: "sender" (not "from") and "message" - support both
-    # Meta can send sender/from as a string (user ID) or as a dict
-    _raw_from = value.get("from") or value.get("sender")
-    from_obj = _raw_from if isinstance(_raw_from, dict) else {}
-    message_obj = value.get("message") or {}
-    
-    # Try alternative structure (messaging array wrapper - value is { messaging: [ {...} ] })
-    if (not from_obj and not isinstance(_raw_from, str)) or not message_obj:
-        messaging = value.get("messaging") or {}
-        if isinstance(messaging, list) and messaging:
-            messaging = messaging[0]
-        if isinstance(messaging, dict):
-            _m_from = messaging.get("sender") or messaging.get("from")
-            if _m_from is not None:
-                from_obj = _m_from if isinstance(_m_from, dict) else {"id": str(_m_from)}
-            if not from_obj and _raw_from is not None:
-                from_obj = {"id": str(_raw_from)} if isinstance(_raw_from, str) else _raw_from
-            message_obj = message_obj or messaging.get("message") or {}
-    
-    # If sender/from was a string (user ID), normalize to dict so rest of code works
-    if isinstance(_raw_from, str) and _raw_from.strip() and not from_obj:
-        from_obj = {"id": str(_raw_from).strip()}
-    
-    # Try items array structure (Instagram Direct Messages)
-    if not from_obj or not message_obj:
-        items = value.get("items") or []
-        if items and isinstance(items, list) and len(items) > 0:
-            item = items[0]
-            if isinstance(item, dict):
-                _i_from = item.get("from")
-                if _i_from is not None:
-                    from_obj = from_obj or (_i_from if isinstance(_i_from, dict) else {"id": str(_i_from)})
-                message_obj = message_obj or item.get("message") or {}
-    
-    # Try direct message structure (some webhook formats)
-    if not message_obj:
-        # Sometimes message data is directly in value
-        if value.get("text"):
-            message_obj = value
-        # Or in a "data" field
-        elif value.get("data") and isinstance(value.get("data"), dict):
-            message_obj = value.get("data")
-    
-    # Extract user_id - try multiple locations (from_obj may now be dict with "id")
-    user_id = None
-    if from_obj and isinstance(from_obj, dict):
-        user_id = from_obj.get("id") or from_obj.get("user_id")
-    if not user_id and isinstance(_raw_from, str) and _raw_from.strip():
-        user_id = str(_raw_from).strip()
-    # Fallback: try direct in value
-    if not user_id:
-        user_id = value.get("sender_id") or value.get("from_id") or value.get("user_id")
-    if user_id is not None:
-        user_id = str(user_id).strip() or None
-    
-    # Extract message text - message_obj can be dict or sometimes a string
-    message_text = ""
-    if isinstance(message_obj, str):
-        message_text = message_obj.strip()
-        message_obj = {}
-    elif message_obj and isinstance(message_obj, dict):
-        message_text = (message_obj.get("text") or message_obj.get("message") or "").strip()
-    # Fallback: try direct in value
-    if not message_text:
-        _v_text = value.get("text") or value.get("message")
-        if isinstance(_v_text, str):
-            message_text = _v_text.strip()
-        else:
-            message_text = (str(_v_text).strip() if _v_text is not None else "")
-    
-    # Extract message_id
-    message_id = None
-    if message_obj and isinstance(message_obj, dict):
-        message_id = message_obj.get("id") or message_obj.get("message_id") or message_obj.get("mid")
-    if not message_id:
-        message_id = value.get("id") or value.get("message_id") or value.get("mid")
-    if message_id is not None:
-        message_id = str(message_id)
-    
-    # Extract username (optional, for logging)
-    username = ""
-    if from_obj and isinstance(from_obj, dict):
-        username = (from_obj.get("username") or from_obj.get("name") or "").strip()
+    # Skip outgoing/echo messages (sent by us) before parsing anything else.
+    # Instagram webhooks can include both incoming and outgoing messages.
+    sent_by = value.get("sent_by")
+    if (
+        value.get("is_echo") is True
+        or value.get("direction") == "outgoing"
+        or (isinstance(sent_by, dict) and sent_by and sent_by.get("id") in {account.instagram_business_id, account.account_id})
+    ):
+        trace["stage"] = "skipped_outgoing_message"
+        return
     
-    # Check if this is an outgoing/echo message (sent by us) - skip those
-    # Instagram webhooks can include both incoming and outgoing messages
-    is_outgoing = False
-    if value.get("is_echo") is True:
-        is_outgoing = True  # Message sent by our business account
-    if value.get("direction") == "outgoing":
-        is_outgoing = True
-    # Also check if there's a "sent_by" field indicating we sent it
-    if value.get("sent_by") and isinstance(value.get("sent_by"), dict):
-        sent_by_id = value.get("sent_by").get("id")
-        if sent_by_id == getattr(account, "instagram_business_id", None) or sent_by_id == account.account_id:
-            is_outgoing = True
+    # Extract message data from webhook payload (before ai_dm check - needed for inbox store)
+    user_id, message_text, message_id, username = _extract_dm_fields(value)
     
-    logger.info(
-        "AI_DM_WEBHOOK",
-        action="extracted_data",
-        account_id=account_id,
-        has_user_id=bool(user_id),
-        has_message_text=bool(message_text),
-        has_username=bool(username),
-        is_outgoing=is_outgoing,
-        message_text_preview=message_text[:50] if message_text else None,
-        user_id=user_id,
-        username=username,
-        message_id=message_id,
-        value_keys=list(value.keys()) if isinstance(value, dict) else None,
-        from_obj_keys=list(from_obj.keys()) if isinstance(from_obj, dict) else None,
-        message_obj_keys=list(message_obj.keys()) if isinstance(message_obj, dict) else None,
-    )
+    # Claimed in _submit_dm; released on failure so Meta's redelivery can retry
+    dedup_key = (account_id, message_id) if message_id else None
     
-    # Skip outgoing messages (messages we sent)
-    if is_outgoing:
-        logger.info(
-            "AI_DM_WEBHOOK",
-            action="skipped",
-            reason="outgoing_message",
-            account_id=account_id,
-            user_id=user_id,
-            message_id=message_id,
-        )
-        return
+    trace["stage"] = "extracted_data"
+    trace["user_id"] = user_id
+    trace["username"] = username
+    trace["message_id"] = message_id
+    trace["has_message_text"] = bool(message_text)
     
     if not user_id:
         logger.warning(
@@ -305,8 +440,7 @@ def _process_incoming_dm_for_ai_reply(account_id: str, value: Dict[str, Any], ap
             action="skipped",
             reason="missing_user_id",
             account_id=account_id,
-            value=value,
-            value_keys=list(value.keys()) if isinstance(value, dict) else None,
+            value_keys=_dict_keys(value),
         )
         return
     
@@ -317,32 +451,24 @@ def _process_incoming_dm_for_ai_reply(account_id: str, value: Dict[str, Any], ap
             reason="empty_message",
             account_id=account_id,
             user_id=user_id,
-            message_obj=message_obj,
         )
         return
 
-    # Always store incoming DM for inbox UI
-    try:
-        inbox_add_message(
-            account_id=account_id,
-            user_id=str(user_id),
-            username=username or "",
-            message=message_text,
-            message_id=str(message_id) if message_id else None,
-        )
-    except Exception as e:
-        logger.warning("DM inbox store failed", error=str(e), account_id=account_id, user_id=user_id)
+    # Always store incoming DM for inbox UI (written when processing ends)
+    inbox["user_id"] = user_id
+    inbox["add"] = {"username": username, "message": message_text, "message_id": message_id}
 
     # DM onboarding flow: handle store-creation onboarding before AI DM replies
+    trace["stage"] = "onboarding"
     try:
         onboarding_result = handle_onboarding_dm(
             account_id=account_id,
-            user_id=str(user_id),
-            username=username or "",
+            user_id=user_id,
+            username=username,
             message_text=message_text,
         )
     except Exception as e:
-        logger.exception(
+        _log_exception(
             "DM_ONBOARDING",
             action="handler_error",
             account_id=account_id,
@@ -370,11 +496,10 @@ def _process_incoming_dm_for_ai_reply(account_id: str, value: Dict[str, Any], ap
                     )
                     return
 
-                recipient_username = (username or "").strip()
                 dm_result = client.send_direct_message(
-                    recipient_username=recipient_username,
+                    recipient_username=username,
                     message=reply_text,
-                    recipient_id=str(user_id) if user_id else None,
+                    recipient_id=user_id,
                 )
                 logger.info(
                     "DM_ONBOARDING",
@@ -385,7 +510,7 @@ def _process_incoming_dm_for_ai_reply(account_id: str, value: Dict[str, Any], ap
                     status=dm_result.get("status"),
                 )
             except Exception as e:
-                logger.exception(
+                _log_exception(
                     "DM_ONBOARDING",
                     action="send_exception",
                     account_id=account_id,
@@ -396,17 +521,28 @@ def _process_incoming_dm_for_ai_reply(account_id: str, value: Dict[str, Any], ap
                 )
         return
 
+    # AI DM auto-reply: enabled by default when ai_dm is None (so DMs get replies); otherwise use account setting.
+    # Checked before the onboarding-state read so accounts with AI DM off stop here.
+    ai_dm_enabled = True
+    auto_send = True
+    if account.ai_dm is not None:
+        ai_dm_enabled = account.ai_dm.enabled
+        auto_send = account.ai_dm.auto_send
+
+    if not ai_dm_enabled:
+        logger.info(
+            "AI_DM_WEBHOOK",
+            action="skipped",
+            reason="ai_dm_disabled",
+            account_id=account_id,
+        )
+        return
+
     # If user is currently in onboarding flow (active, not failed/completed), do not let AI DM take over
     try:
-        session = get_session(account_id, str(user_id))
+        session = get_session(account_id, user_id)
         step = session.get("step") or "idle"
-        active_steps = {
-            "awaiting_email_or_mobile",
-            "awaiting_store_name",
-            "awaiting_currency",
-            "confirming",
-        }
-        if step in active_steps:
+        if step in _ONBOARDING_ACTIVE_STEPS:
             logger.info(
                 "AI_DM_WEBHOOK",
                 action="skipped",
@@ -425,38 +561,22 @@ def _process_incoming_dm_for_ai_reply(account_id: str, value: Dict[str, Any], ap
             error=str(e),
         )
 
-    # AI DM auto-reply: enabled by default when ai_dm is None (so DMs get replies); otherwise use account setting
-    ai_dm_enabled = True
-    auto_send = True
-    if hasattr(account, "ai_dm") and account.ai_dm is not None:
-        ai_dm_enabled = getattr(account.ai_dm, "enabled", True)
-        auto_send = getattr(account.ai_dm, "auto_send", True)
-
-    if not ai_dm_enabled:
-        logger.info(
-            "AI_DM_WEBHOOK",
-            action="skipped",
-            reason="ai_dm_disabled",
-            account_id=account_id,
-        )
-        return
-
-    logger.info(
-        "AI_DM_WEBHOOK",
-        action="processing",
-        account_id=account_id,
-        user_id=user_id,
-        message_id=message_id,
-        message_preview=message_text[:100],
-        auto_send=auto_send,
-    )
+    trace["stage"] = "ai_reply"
+    trace["auto_send"] = auto_send
 
-    # Initialize AI DM handler
+    # Initialize AI DM handler. It loads reply tracking and AI Brain state from data/ when
+    # constructed, so it is built per DM to pick up dashboard changes; without an OpenAI key
+    # it could never be available, so skip building it at all.
     try:
-        ai_handler = AIDMHandler()
+        if os.getenv("OPENAI_API_KEY", "").strip():
+            # Imported on first use: the AI DM feature (tenacity, AI Brain) isn't needed to ack webhooks
+            from src.features.ai_dm import AIDMHandler
+            ai_handler = AIDMHandler()
+        else:
+            ai_handler = None
         
         # Check if AI handler is available (has OpenAI API key)
-        if not ai_handler.is_available():
+        if ai_handler is None or not ai_handler.is_available():
             logger.warning(
                 "AI_DM_WEBHOOK",
                 action="skipped",
@@ -473,14 +593,11 @@ def _process_incoming_dm_for_ai_reply(account_id: str, value: Dict[str, Any], ap
             reply_text = ai_handler.get_ai_reply(
                 message=message_text,
                 account_id=account_id,
-                user_id=str(user_id),
+                user_id=user_id,
                 account_username=account.username,
             )
             if reply_text:
-                try:
-                    inbox_update_suggestion(account_id, str(user_id), reply_text)
-                except Exception as e:
-                    logger.warning("Inbox update suggestion failed", error=str(e))
+                inbox["suggestion"] = reply_text
             logger.info(
                 "AI_DM_WEBHOOK",
                 action="suggestion_stored",
@@ -493,13 +610,13 @@ def _process_incoming_dm_for_ai_reply(account_id: str, value: Dict[str, Any], ap
         # Auto-send mode: process and send
         result = ai_handler.process_incoming_dm(
             account_id=account_id,
-            user_id=str(user_id),
+            user_id=user_id,
             message_text=message_text,
-            message_id=str(message_id) if message_id else None,
+            message_id=message_id,
             account_username=account.username,
         )
     except Exception as e:
-        logger.exception(
+        _log_exception(
             "AI_DM_WEBHOOK",
             action="handler_error",
             account_id=account_id,
@@ -508,6 +625,9 @@ def _process_incoming_dm_for_ai_reply(account_id: str, value: Dict[str, Any], ap
             error=str(e),
             error_type=type(e).__name__,
         )
+        # Let a redelivery retry a DM that failed before any reply went out
+        if dedup_key:
+            _seen_dm_ids.forget(dedup_key)
         return
 
     # Send reply if generated
@@ -515,17 +635,6 @@ def _process_incoming_dm_for_ai_reply(account_id: str, value: Dict[str, Any], ap
     reply_text = result.get("reply_text")
     if reply_text:
         try:
-            # Validate we have required data
-            if not user_id:
-                logger.error(
-                    "AI_DM_WEBHOOK",
-                    action="send_failed",
-                    reason="missing_user_id",
-                    account_id=account_id,
-                    message_id=message_id,
-                )
-                return
-            
             try:
                 client = app.account_service.get_client(account_id)
             except AccountError as e:
@@ -539,33 +648,18 @@ def _process_incoming_dm_for_ai_reply(account_id: str, value: Dict[str, Any], ap
                 )
                 return
             # Username is optional - send_direct_message can work with just recipient_id
-            recipient_username = (username or "").strip()
-            if not recipient_username and from_obj and isinstance(from_obj, dict):
-                recipient_username = (from_obj.get("username") or from_obj.get("name") or "").strip()
-            
-            logger.info(
-                "AI_DM_WEBHOOK",
-                action="sending_reply",
-                account_id=account_id,
-                user_id=user_id,
-                recipient_username=recipient_username or "N/A",
-                has_recipient_id=bool(user_id),
-                reply_length=len(reply_text),
-                reply_preview=reply_text[:100],
-                status=result.get("status"),
-            )
+            trace["stage"] = "sending_reply"
+            trace["reply_length"] = len(reply_text)
+            trace["reply_status"] = result.get("status")
             
             dm_result = client.send_direct_message(
-                recipient_username=recipient_username,
+                recipient_username=username,
                 message=reply_text,
-                recipient_id=str(user_id) if user_id else None,
+                recipient_id=user_id,
             )
             
             if dm_result.get("status") == "success":
-                try:
-                    inbox_mark_sent(account_id, str(user_id))
-                except Exception as e:
-                    logger.warning("Inbox mark_sent failed", error=str(e))
+                inbox["sent"] = True
                 logger.info(
                     "AI_DM_WEBHOOK",
                     action="reply_sent",
@@ -592,7 +686,7 @@ def _process_incoming_dm_for_ai_reply(account_id: str, value: Dict[str, Any], ap
                         error=error_msg,
                         note="User must have messaged you first within 24 hours",
                     )
-                elif error_code in [100, 200]:
+                elif error_code in _PERMISSION_ERROR_CODES:
                     logger.warning(
                         "AI_DM_WEBHOOK",
                         action="reply_failed",
@@ -615,7 +709,7 @@ def _process_incoming_dm_for_ai_reply(account_id: str, value: Dict[str, Any], ap
                         error_code=error_code,
                     )
         except Exception as e:
-            logger.exception(
+            _log_exception(
                 "AI_DM_WEBHOOK",
                 action="send_exception",
                 account_id=account_id,
@@ -624,6 +718,8 @@ def _process_incoming_dm_for_ai_reply(account_id: str, value: Dict[str, Any], ap
                 error=str(e),
                 error_type=type(e).__name__,
             )
+            if dedup_key:
+                _seen_dm_ids.forget(dedup_key)
     else:
         logger.warning(
             "AI_DM_WEBHOOK",
@@ -634,169 +730,275 @@ def _process_incoming_dm_for_ai_reply(account_id: str, value: Dict[str, Any], ap
             status=result.get("status"),
             reason=result.get("reason"),
             has_reply_text=bool(result.get("reply_text")),
-            result_keys=list(result.keys()) if isinstance(result, dict) else None,
+            result_keys=_dict_keys(result),
+        )
+
+
+def _run_job(fn: Callable[..., None], account_id: str, *args: Any) -> None:
+    try:
+        fn(*args)
+    except Exception as e:
+        _log_exception(
+            "Instagram webhook background job failed",
+            job=fn.__name__,
+            account_id=account_id,
+            error=str(e),
+            error_type=type(e).__name__,
+        )
+    finally:
+        _dm_slots.release()
+
+
+def _submit_job(fn: Callable[..., None], account_id: str, *args: Any) -> bool:
+    """Queue fn(*args) on the webhook worker pool. Returns False if the backlog is full."""
+    if not _dm_slots.acquire(blocking=False):
+        logger.warning(
+            "Instagram webhook job dropped: processing backlog full",
+            job=fn.__name__,
+            account_id=account_id,
+            limit=_DM_WORKERS + _DM_BACKLOG_LIMIT,
         )
+        return False
+    try:
+        _dm_executor.submit(_run_job, fn, account_id, *args)
+    except RuntimeError as e:
+        # Executor already shut down (app stopping)
+        _dm_slots.release()
+        logger.warning("Instagram webhook job not queued", job=fn.__name__, account_id=account_id, error=str(e))
+        return False
+    return True
+
+
+def _submit_dm(account_id: str, value: Dict[str, Any], app: Any) -> bool:
+    """
+    Queue a DM for background AI reply processing.
+    
+    Returns False if it is a duplicate delivery of a DM already queued or handled,
+    or if the backlog is full.
+    """
+    message_id = _first(value, _dm_paths_for(value)[2])
+    dedup_key = (account_id, message_id) if message_id else None
+    if dedup_key and not _seen_dm_ids.claim(dedup_key):
+        logger.info(
+            "AI_DM_WEBHOOK",
+            action="skipped",
+            reason="duplicate_delivery",
+            account_id=account_id,
+            message_id=message_id,
+        )
+        return False
+    if not _submit_job(_process_incoming_dm_for_ai_reply, account_id, account_id, value, app):
+        if dedup_key:
+            _seen_dm_ids.forget(dedup_key)
+        return False
+    return True
+
+
+def shutdown_dm_workers() -> None:
+    """Stop the webhook worker pool, discarding jobs that haven't started processing."""
+    _dm_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _cached_caption(key: Tuple[str, str]) -> Optional[str]:
+    with _caption_cache_lock:
+        hit = _caption_cache.get(key)
+        if hit is None:
+            return None
+        if hit[0] <= time.monotonic():
+            del _caption_cache[key]
+            return None
+        return hit[1]
+
+
+def _post_caption(app: Any, account_id: str, media_id: str) -> Optional[str]:
+    """Return the post caption (cached per media), or None if it can't be fetched."""
+    key = (account_id, media_id)
+    caption = _cached_caption(key)
+    if caption is not None:
+        return caption
+
+    with _caption_cache_lock:
+        fetch_lock = _caption_fetch_locks.setdefault(key, threading.Lock())
+    try:
+        with fetch_lock:
+            # Another worker may have fetched it while we waited
+            caption = _cached_caption(key)
+            if caption is not None:
+                return caption
+            try:
+                client = app.account_service.get_client(account_id)
+                media_info = client._make_request(
+                    "GET",
+                    media_id,
+                    params={"fields": "caption"}
+                )
+                caption = media_info.get("caption", "")
+            except Exception as e:
+                logger.debug(
+                    "Could not fetch post caption for webhook comment",
+                    account_id=account_id,
+                    media_id=media_id,
+                    error=str(e),
+                )
+                return None
+            with _caption_cache_lock:
+                if len(_caption_cache) >= _CAPTION_CACHE_MAXSIZE:
+                    _caption_cache.popitem(last=False)
+                _caption_cache[key] = (time.monotonic() + _CAPTION_TTL, caption)
+            return caption
+    finally:
+        with _caption_cache_lock:
+            if _caption_fetch_locks.get(key) is fetch_lock:
+                del _caption_fetch_locks[key]
+
+
+def _forward_comments_for_dm(app: Any, account_id: str, media_id: str, comments: List[Dict[str, Any]]) -> None:
+    """
+    Send one media's webhook comments to comment-to-DM one at a time, in arrival order.
+    The caption is fetched once per media. Each comment is its own call because
+    process_new_comments_for_dm stops at the last processed comment id, which would drop
+    the rest of a batch, and Meta doesn't order changes[] so a batch can't be sorted newest-first.
+    """
+    # Try to get post caption for better AI context (optional, don't fail if unavailable)
+    post_caption = None
+    if getattr(app, "account_service", None):
+        post_caption = _post_caption(app, account_id, media_id)
+    
+    for comment in comments:
+        try:
+            app.comment_to_dm_service.process_new_comments_for_dm(
+                account_id=account_id,
+                media_id=media_id,
+                comments=[comment],
+                post_caption=post_caption,
+            )
+            logger.info(
+                "Instagram webhook comment forwarded to comment-to-DM",
+                account_id=account_id,
+                media_id=media_id,
+                comment_id=comment.get("id"),
+            )
+        except Exception as e:
+            _log_exception(
+                "Instagram webhook comment forward failed",
+                account_id=account_id,
+                media_id=media_id,
+                comment_id=comment.get("id"),
+                error=str(e),
+                error_type=type(e).__name__,
+            )
 
 
 def process_webhook_payload(body: Any, app: Any) -> None:
     """
     Parse Instagram webhook payload, log it, forward comments to comment-to-DM service
-    and messages to logging. Does not modify comment logic.
+    and queue messages for background AI reply processing. Does not modify comment logic.
     """
     payload = _normalize_payload(body)
+    obj = payload.get("object")
+    if obj != "instagram":
+        logger.debug("Instagram webhook ignored: object is not instagram", object=obj)
+        return
+
     entries = payload.get("entry") or []
     # Log which format we received (messaging vs changes) for debugging
-    first_entry = entries[0] if entries else {}
-    has_messaging = bool(first_entry.get("messaging"))
-    has_changes = bool(first_entry.get("changes"))
+    first_entry = entries[0] if entries and isinstance(entries[0], dict) else {}
     logger.info(
         "Instagram webhook payload received",
         payload_type=type(body).__name__,
-        object_type=payload.get("object"),
+        object_type=obj,
         entry_count=len(entries),
-        has_messaging=has_messaging,
-        has_changes=has_changes,
+        has_messaging=bool(first_entry.get("messaging")),
+        has_changes=bool(first_entry.get("changes")),
     )
 
-    obj = payload.get("object")
-    if obj != "instagram":
-        logger.debug("Instagram webhook ignored: object is not instagram", object=obj)
-        return
-
+    # Meta may batch several entries for the same account: group them so each
+    # account is resolved once, and group comments per (account, media) so the caption is fetched once
+    comments_by_media: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    entries_by_ig_id: Dict[str, List[Dict[str, Any]]] = {}
     for entry in entries:
-        ig_id = entry.get("id")
-        if not ig_id:
-            continue
-        account_id = _account_id_for_ig_business(str(ig_id), app)
-
-        # Format 1: Instagram Messaging (Messenger Platform) - entry.messaging[] (no "changes")
-        messaging_list = entry.get("messaging") or []
-        if isinstance(messaging_list, list):
-            for messaging_item in messaging_list:
-                if not isinstance(messaging_item, dict):
+        if isinstance(entry, dict) and entry.get("id"):
+            entries_by_ig_id.setdefault(str(entry["id"]), []).append(entry)
+
+    for ig_id, ig_entries in entries_by_ig_id.items():
+        account_id = _account_id_for_ig_business(ig_id, app)
+        can_forward_comments = bool(account_id and app and getattr(app, "comment_to_dm_service", None))
+
+        for entry in ig_entries:
+            # Format 1: Instagram Messaging (Messenger Platform) - entry.messaging[] (no "changes")
+            messaging_list = entry.get("messaging") or []
+            if isinstance(messaging_list, list):
+                for messaging_item in messaging_list:
+                    if not isinstance(messaging_item, dict):
+                        continue
+                    if account_id and app:
+                        _submit_dm(account_id, messaging_item, app)
+
+            # Format 2: Instagram Graph API - entry.changes[] with field "messages"
+            changes = entry.get("changes") or ()
+            for change in changes:
+                field = change.get("field")
+                value = change.get("value")
+                if not isinstance(value, dict):
                     continue
-                if account_id and app:
-                    try:
-                        _process_incoming_dm_for_ai_reply(
-                            account_id=account_id,
-                            value=messaging_item,
-                            app=app,
-                        )
-                    except Exception as e:
-                        logger.exception(
-                            "AI DM auto-reply failed (messaging format)",
-                            account_id=account_id,
-                            error=str(e),
-                            value=messaging_item,
-                        )
 
-        # Format 2: Instagram Graph API - entry.changes[] with field "messages"
-        for change in entry.get("changes") or []:
-            field = change.get("field")
-            value = change.get("value")
-            if not isinstance(value, dict):
-                continue
-
-            if field in ("comments", "live_comments"):
-                comment = _webhook_comment_to_service_format(value)
-                media_id = _media_id_from_comment_value(value)
-                if not media_id:
-                    logger.warning(
-                        "Instagram webhook comment missing media id",
-                        entry_id=ig_id,
-                        comment_id=comment.get("id"),
-                    )
-                    continue
-                comments = [comment]
-                
-                # Try to get post caption for better AI context (optional, don't fail if unavailable)
-                post_caption = None
-                if account_id and app and getattr(app, "account_service", None):
-                    try:
-                        client = app.account_service.get_client(account_id)
-                        media_info = client._make_request(
-                            "GET",
-                            media_id,
-                            params={"fields": "caption"}
-                        )
-                        post_caption = media_info.get("caption", "")
-                    except Exception as e:
-                        logger.debug(
-                            "Could not fetch post caption for webhook comment",
-                            account_id=account_id,
-                            media_id=media_id,
-                            error=str(e),
-                        )
-                        # Continue without caption - not critical
-                
-                if account_id and app and getattr(app, "comment_to_dm_service", None):
-                    try:
-                        app.comment_to_dm_service.process_new_comments_for_dm(
-                            account_id=account_id,
-                            media_id=media_id,
-                            comments=comments,
-                            post_caption=post_caption,
+                if field in _COMMENT_FIELDS:
+                    comment = _webhook_comment_to_service_format(value)
+                    media_id = comment["media"]["id"]
+                    if not media_id:
+                        logger.warning(
+                            "Instagram webhook comment missing media id",
+                            entry_id=ig_id,
+                            comment_id=comment.get("id"),
                         )
+                        continue
+                    comment_id = comment.get("id")
+                    if account_id and comment_id and not _seen_comment_ids.claim((account_id, comment_id)):
                         logger.info(
-                            "Instagram webhook comment forwarded to comment-to-DM",
+                            "Instagram webhook comment skipped (duplicate delivery)",
                             account_id=account_id,
                             media_id=media_id,
-                            comment_id=comment.get("id"),
+                            comment_id=comment_id,
                         )
-                    except Exception as e:
-                        logger.exception(
-                            "Instagram webhook comment forward failed",
+                        continue
+                    if can_forward_comments:
+                        comments_by_media.setdefault((account_id, str(media_id)), []).append(comment)
+                    else:
+                        logger.debug(
+                            "Instagram webhook comment not forwarded (no account or service)",
+                            ig_id=ig_id,
                             account_id=account_id,
-                            media_id=media_id,
-                            error=str(e),
                         )
-                else:
-                    logger.debug(
-                        "Instagram webhook comment not forwarded (no account or service)",
-                        ig_id=ig_id,
-                        account_id=account_id,
-                    )
 
-            elif field == "messages":
-                logger.info(
-                    "Instagram webhook messages event",
-                    entry_id=ig_id,
-                    account_id=account_id,
-                    has_account_id=bool(account_id),
-                    has_app=bool(app),
-                    value_type=type(value).__name__,
-                    value_keys=list(value.keys()) if isinstance(value, dict) else None,
-                    value_preview=str(value)[:500] if isinstance(value, dict) else str(value)[:200],
-                )
-                if not account_id or not app:
-                    logger.warning(
-                        "AI DM webhook skipped - missing account_id or app",
+                elif field == "messages":
+                    logger.info(
+                        "Instagram webhook messages event",
                         entry_id=ig_id,
                         account_id=account_id,
+                        has_account_id=bool(account_id),
                         has_app=bool(app),
+                        **_payload_debug_fields(value),
                     )
-                    continue
-                # Normalize: Graph API may send value.messages[] or a single message object
-                to_process: List[Dict[str, Any]] = []
-                if isinstance(value, dict):
+                    if not account_id or not app:
+                        logger.warning(
+                            "AI DM webhook skipped - missing account_id or app",
+                            entry_id=ig_id,
+                            account_id=account_id,
+                            has_app=bool(app),
+                        )
+                        continue
+                    # Normalize: Graph API may send value.messages[] or a single message object
+                    to_process: List[Dict[str, Any]] = []
                     msgs = value.get("messages")
                     if isinstance(msgs, list) and msgs:
-                        for m in msgs:
-                            if isinstance(m, dict):
-                                to_process.append(m)
+                        to_process = [m for m in msgs if isinstance(m, dict)]
                     elif value.get("sender") or value.get("from") or value.get("message") or value.get("text"):
                         to_process.append(value)
-                for msg_value in to_process:
-                    try:
-                        _process_incoming_dm_for_ai_reply(
-                            account_id=account_id,
-                            value=msg_value,
-                            app=app,
-                        )
-                    except Exception as e:
-                        logger.exception(
-                            "AI DM auto-reply processing failed",
-                            account_id=account_id,
-                            error=str(e),
-                            value=msg_value,
-                        )
+                    for msg_value in to_process:
+                        _submit_dm(account_id, msg_value, app)
+
+    for (account_id, media_id), comments in comments_by_media.items():
+        if not _submit_job(_forward_comments_for_dm, account_id, app, account_id, media_id, comments):
+            # Not forwarded: let Meta's redelivery try these comments again
+            for comment in comments:
+                _seen_comment_ids.forget((account_id, comment.get("id")))
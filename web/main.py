@@ -2,39 +2,73 @@
 
 import sys
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
 import os
+import re
+import logging
+import stat
+import functools
+import mimetypes
+import json
+import asyncio
+import hashlib
+import hmac
+from email.utils import formatdate, parsedate_tz, mktime_tz
+from urllib.parse import quote
 
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse, PlainTextResponse, JSONResponse
+from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse, PlainTextResponse, JSONResponse, Response, StreamingResponse
 from fastapi.concurrency import run_in_threadpool
 from starlette.types import ASGIApp, Receive, Scope, Send
+from anyio import to_thread
 from jinja2 import Environment, FileSystemLoader
 
-from .api import router as api_router, auth_router
+from .api import router as api_router, auth_router, set_app_instance
+from .auth_deps import get_session_token
+from .cron_config import SESSION_SWEEP_INTERVAL_SECONDS, SCHEDULED_PUBLISHER_INTERVAL_SECONDS, TOKEN_REFRESH_INTERVAL_SECONDS
+from .webhook_config import get_webhook_config
 from .cloudflare_helper import start_cloudflare, stop_cloudflare, get_cloudflare_url
-from .instagram_webhook import process_webhook_payload
+from .instagram_webhook import process_webhook_payload, shutdown_dm_workers
 from .scheduled_publisher import start_scheduled_publisher, stop_scheduled_publisher
 from .warming_scheduler import start_warming_scheduler, stop_warming_scheduler
 from src.features.warmup.scheduler import start_scheduler as start_warmup_automation_scheduler, stop_scheduler as stop_warmup_automation_scheduler
 from .rest_cycle import start_rest_cycle, stop_rest_cycle
 from src.app import InstaForgeApp
 from src.services.token_refresher import start_daily_token_refresh_job, stop_daily_token_refresh_job
+from src.auth.user_auth import start_session_sweeper, stop_session_sweeper, validate_session, peek_cached_session
 from src.utils.logger import get_logger
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Optional: faster JSON for API responses and webhook bodies
+
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 logger = get_logger(__name__)
+_std_logger = logging.getLogger(__name__)
+
+
+class _ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson; the app default when orjson is installed."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+# Webhook bodies are parsed from raw bytes; orjson.JSONDecodeError subclasses json.JSONDecodeError
+_json_loads = orjson.loads if orjson is not None else json.loads
 
 # Initialize FastAPI app
 app = FastAPI(
     title="InstaForge Web Dashboard",
     description="Web dashboard for Instagram automation",
     version="1.0.0",
+    default_response_class=_ORJSONResponse if orjson is not None else JSONResponse,
 )
 
 # CORS middleware - configurable for production
@@ -67,27 +101,54 @@ PUBLIC_ROUTES = {
     "/api/health",
 }
 PUBLIC_PREFIXES = ["/static/", "/uploads/"]
+# /api/ and /auth/ routes do their own auth via dependencies; one str.startswith call checks them all
+_PUBLIC_PATH_PREFIXES = tuple(PUBLIC_PREFIXES) + ("/api/", "/auth/")
 
 
 def _get_session_token_from_scope(scope: Scope) -> Optional[str]:
     """Extract session_token from ASGI scope (Cookie or Authorization header)."""
-    headers = scope.get("headers") or []
-    headers_lower = {k.decode("latin-1").lower(): v for k, v in headers}
-    auth = headers_lower.get("authorization")
-    if auth:
-        auth_decoded = auth.decode("latin-1")
-        if auth_decoded.startswith("Bearer "):
-            return auth_decoded[7:].strip()
-    cookie = headers_lower.get("cookie")
+    # ASGI header names are lowercase bytes; only the two headers we need are decoded
+    auth = cookie = None
+    for name, value in scope.get("headers") or ():
+        if name == b"authorization":
+            auth = value
+        elif name == b"cookie":
+            cookie = value
+    if auth and auth.startswith(b"Bearer "):
+        return auth[7:].decode("latin-1").strip()
     if cookie:
-        cookie_decoded = cookie.decode("latin-1")
-        for part in cookie_decoded.split(";"):
+        for part in cookie.split(b";"):
             part = part.strip()
-            if part.startswith("session_token="):
-                return part.split("=", 1)[1].strip()
+            if part.startswith(b"session_token="):
+                return part[14:].decode("latin-1").strip()
     return None
 
 
+# Threadpool size for run_in_threadpool / sync endpoints (AnyIO's default is 40); set at startup
+THREADPOOL_TOKENS = int(os.getenv("THREADPOOL_TOKENS", "200"))
+# A slow session store fails the request fast instead of pinning a worker thread per request
+_SESSION_VALIDATE_TIMEOUT = float(os.getenv("SESSION_VALIDATE_TIMEOUT", "5"))
+
+
+async def _validate_session_async(token: str):
+    """
+    validate_session, answered inline when the token's result is cached (no threadpool hop).
+    Raises asyncio.TimeoutError when the store doesn't answer within _SESSION_VALIDATE_TIMEOUT.
+    """
+    hit, user = peek_cached_session(token)
+    if hit:
+        return user
+    try:
+        return await asyncio.wait_for(run_in_threadpool(validate_session, token), timeout=_SESSION_VALIDATE_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(
+            "Session validation timed out",
+            timeout_seconds=_SESSION_VALIDATE_TIMEOUT,
+            token_hash=hashlib.sha256(token.encode("utf-8")).hexdigest()[:12],
+        )
+        raise
+
+
 class AuthMiddlewareASGI:
     """Raw ASGI auth middleware; avoids request stream wrapping that causes CancelledError on disconnect."""
 
@@ -99,21 +160,25 @@ class AuthMiddlewareASGI:
             await self.app(scope, receive, send)
             return
         path = scope.get("path") or ""
-        is_public = (
-            path in PUBLIC_ROUTES
-            or any(path.startswith(p) for p in PUBLIC_PREFIXES)
-            or path.startswith("/api/")
-            or path.startswith("/auth/")
-        )
-        if is_public:
+        if path in PUBLIC_ROUTES or path.startswith(_PUBLIC_PATH_PREFIXES):
             await self.app(scope, receive, send)
             return
-        from src.auth.user_auth import validate_session
         token = _get_session_token_from_scope(scope)
-        user = await run_in_threadpool(validate_session, token) if token else None
+        try:
+            user = await _validate_session_async(token) if token else None
+        except asyncio.TimeoutError:
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [[b"content-type", b"application/json"], [b"retry-after", b"1"]],
+            })
+            await send({
+                "type": "http.response.body",
+                "body": b'{"detail":"Session check timed out"}',
+            })
+            return
         if not user:
-            headers_list = list(scope.get("headers") or [])
-            accept = next((v for k, v in headers_list if k.lower() == b"accept"), b"")
+            accept = next((v for k, v in scope.get("headers") or () if k == b"accept"), b"")
             if accept.decode("latin-1", errors="replace").strip().startswith("text/html"):
                 await send({
                     "type": "http.response.start",
@@ -132,6 +197,8 @@ class AuthMiddlewareASGI:
                 "body": b'{"detail":"Not authenticated"}',
             })
             return
+        # Page handlers read the validated user from request.state instead of validating again
+        scope.setdefault("state", {})["user"] = user
         await self.app(scope, receive, send)
 
 
@@ -140,54 +207,192 @@ app.add_middleware(AuthMiddlewareASGI)
 
 # Mount static files
 static_path = Path(__file__).parent / "static"
-app.mount("/static", StaticFiles(directory=static_path), name="static")
+# Set SERVE_STATIC=0 when the reverse proxy serves web/static/ at /static/ itself
+SERVE_STATIC = os.getenv("SERVE_STATIC", "1").strip().lower() not in ("0", "false", "no")
+# Asset names are not versioned, so browsers revalidate (ETag / Last-Modified) after an hour
+_STATIC_CACHE_CONTROL = "public, max-age=3600" if ENVIRONMENT == "production" else "no-cache"
+
+
+class _CachedStaticFiles(StaticFiles):
+    """StaticFiles that adds a Cache-Control header so browsers reuse assets between page loads."""
+
+    def file_response(self, *args, **kwargs) -> Response:
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = _STATIC_CACHE_CONTROL
+        return response
+
+
+if SERVE_STATIC:
+    app.mount("/static", _CachedStaticFiles(directory=static_path), name="static")
 
 # Uploads directory: absolute path for reliable deployment (Render, Apache, etc.)
 _web_dir = Path(__file__).resolve().parent
 uploads_path = _web_dir.parent / "uploads"
 uploads_path.mkdir(exist_ok=True)
+# Traversal-check prefix for resolved upload paths, built once rather than per request
+_UPLOADS_ROOT_PREFIX = str(uploads_path.resolve()) + os.sep
+
+# Optional: when nginx fronts the app, set this to an `internal` location aliased to uploads/
+# (e.g. /internal-uploads/) and nginx streams upload files itself (sendfile, Range) via X-Accel-Redirect
+UPLOADS_X_ACCEL_PREFIX = os.getenv("UPLOADS_X_ACCEL_PREFIX", "").strip()
+_X_ACCEL_BASE = UPLOADS_X_ACCEL_PREFIX.rstrip("/") + "/"
+# Apache equivalent (mod_xsendfile with XSendFilePath pointing at uploads/): X-Sendfile carries the absolute path
+UPLOADS_X_SENDFILE = os.getenv("UPLOADS_X_SENDFILE", "").strip().lower() in ("1", "true", "yes")
 
 # Direct file serving route for uploads (for better Instagram compatibility)
 # IMPORTANT: This route MUST be public (no auth) and serve raw bytes with correct Content-Type
 # Instagram's crawler requires: raw bytes, correct Content-Type, byte-range support for MP4
+_UPLOAD_CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, HEAD, OPTIONS",
+    "Access-Control-Allow-Headers": "Range",
+}
+# Sent with every upload response; Content-Type (and length/range headers) are added per request
+_UPLOAD_HEADERS = {
+    **_UPLOAD_CORS_HEADERS,
+    "Cache-Control": "public, max-age=31536000",
+    "Accept-Ranges": "bytes",
+}
+# Preflight answer is the same for every file, so one response instance is reused
+_UPLOAD_PREFLIGHT_RESPONSE = Response(
+    status_code=200,
+    headers={**_UPLOAD_CORS_HEADERS, "Access-Control-Max-Age": "3600"},
+)
+
+
 @app.options("/uploads/{filename:path}")
 async def serve_upload_file_options(filename: str):
     """Handle CORS preflight requests for uploads"""
-    from fastapi.responses import Response
-    return Response(
-        status_code=200,
-        headers={
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET, HEAD, OPTIONS",
-            "Access-Control-Allow-Headers": "Range",
-            "Access-Control-Max-Age": "3600",
-        }
-    )
+    return _UPLOAD_PREFLIGHT_RESPONSE
+
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$", re.IGNORECASE | re.ASCII)
+# Read size for partial responses; video ranges (player/crawler seeks) tend to be large
+_RANGE_CHUNK_SIZE = 256 * 1024
+_VIDEO_RANGE_CHUNK_SIZE = 1024 * 1024
 
 
-def _parse_range_header(range_header: str | None, file_size: int) -> tuple[int, int] | None:
+def _iter_file_range(path: Path, start: int, length: int, chunk_size: int):
     """
-    Parse Range header (bytes=start-end) and return (start, end) inclusive, or None.
+    Yield length bytes of path from offset start. Uses positional reads (os.pread) so there is no
+    per-chunk seek, and hints sequential access so kernel readahead covers the next chunk.
+    Starlette runs this sync generator in its threadpool.
+    """
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, start, length, os.POSIX_FADV_SEQUENTIAL)
+        offset = start
+        end = start + length
+        while offset < end:
+            to_read = min(chunk_size, end - offset)
+            if hasattr(os, "pread"):
+                chunk = os.pread(fd, to_read, offset)
+            else:  # Windows
+                os.lseek(fd, offset, os.SEEK_SET)
+                chunk = os.read(fd, to_read)
+            if not chunk:
+                break
+            offset += len(chunk)
+            yield chunk
+    finally:
+        os.close(fd)
+
+
+def _parse_range_header(range_header: Optional[str], file_size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single Range header (bytes=start-end, bytes=start-, bytes=-suffix) into (start, end) inclusive.
     Instagram's crawler sends Range requests for MP4 streaming.
+    Returns None when there is no usable range (serve the whole file); raises ValueError when the
+    range is well-formed but unsatisfiable for this file (respond 416).
     """
-    if not range_header or not range_header.strip().lower().startswith("bytes="):
+    if not range_header:
+        return None
+    match = _RANGE_RE.match(range_header.strip())
+    if not match:
         return None
+    start_str, end_str = match.groups()
+    if not start_str and not end_str:
+        return None
+    if not start_str:
+        # Suffix range: the last N bytes
+        suffix = int(end_str)
+        if suffix == 0 or file_size == 0:
+            raise ValueError("unsatisfiable range")
+        return (max(0, file_size - suffix), file_size - 1)
+    start = int(start_str)
+    if end_str and int(end_str) < start:
+        return None
+    if start >= file_size:
+        raise ValueError("unsatisfiable range")
+    end = int(end_str) if end_str else file_size - 1
+    return (start, min(end, file_size - 1))
+
+
+# Content-Type by extension (Instagram is strict); others fall back to mimetypes
+_UPLOAD_CONTENT_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".mp4": "video/mp4",
+    ".mov": "video/mp4",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+}
+# Load the system mime.types tables now rather than on the first uncommon upload request
+mimetypes.init()
+
+
+def _upload_validators(stat_result: os.stat_result) -> Tuple[str, str]:
+    """(ETag, Last-Modified) for an upload, derived from its size and mtime."""
+    etag = f'W/"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+    return etag, formatdate(stat_result.st_mtime, usegmt=True)
+
+
+def _upload_not_modified(request: Request, etag: str, stat_result: os.stat_result) -> bool:
+    """True when the client's If-None-Match / If-Modified-Since show its copy is current (RFC 9110 13.2.2)."""
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        # Weak comparison: W/ prefixes are ignored
+        if if_none_match.strip() == "*":
+            return True
+        opaque = etag[2:]
+        return any(
+            (tag[2:] if tag.startswith("W/") else tag) == opaque
+            for tag in (t.strip() for t in if_none_match.split(","))
+        )
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if if_modified_since:
+        parsed = parsedate_tz(if_modified_since)
+        if parsed is not None:
+            return int(stat_result.st_mtime) <= mktime_tz(parsed)
+    return False
+
+
+@functools.lru_cache(maxsize=4096)
+def _resolve_upload(filename: str) -> Optional[Tuple[Path, str]]:
+    """
+    Return (path, content_type) for a file under uploads/, or None if the name escapes it.
+    Only path and extension work is cached (upload names are unique and never reused);
+    existence and size are still checked per request.
+    """
+    file_path = uploads_path / filename
     try:
-        parts = range_header[6:].strip().split("-")
-        if len(parts) != 2:
-            return None
-        start_str, end_str = parts[0].strip(), parts[1].strip()
-        start = int(start_str) if start_str else 0
-        end = int(end_str) if end_str else file_size - 1
-        if start < 0 or end >= file_size or start > end:
-            return None
-        return (start, end)
-    except (ValueError, IndexError):
+        resolved_path = file_path.resolve()
+    except (ValueError, OSError):
         return None
+    if not str(resolved_path).startswith(_UPLOADS_ROOT_PREFIX):
+        return None
+    ext = file_path.suffix.lower()
+    content_type = (
+        _UPLOAD_CONTENT_TYPES.get(ext)
+        or mimetypes.guess_type(str(file_path))[0]
+        or "application/octet-stream"
+    )
+    return file_path, content_type
 
 
-@app.get("/uploads/{filename:path}")
-@app.head("/uploads/{filename:path}")
+@app.api_route("/uploads/{filename:path}", methods=["GET", "HEAD"])
 async def serve_upload_file(filename: str, request: Request):
     """
     Serve uploaded files with byte-range support for Instagram MP4 compatibility.
@@ -199,21 +404,18 @@ async def serve_upload_file(filename: str, request: Request):
     - MUST support HEAD and Range requests (byte-range for video streaming)
     - MUST not redirect
     """
-    import mimetypes
-    from fastapi.responses import Response, StreamingResponse
-
-    file_path = uploads_path / filename
 
     # Security: prevent directory traversal
-    try:
-        resolved_path = file_path.resolve()
-        resolved_uploads = uploads_path.resolve()
-        if not str(resolved_path).startswith(str(resolved_uploads)):
-            raise HTTPException(status_code=403, detail="Invalid file path")
-    except (ValueError, OSError):
+    resolved = _resolve_upload(filename)
+    if resolved is None:
         raise HTTPException(status_code=403, detail="Invalid file path")
+    file_path, content_type = resolved
 
-    if not file_path.exists() or not file_path.is_file():
+    try:
+        stat_result = file_path.stat()
+    except OSError:
+        stat_result = None
+    if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
         user_agent = request.headers.get("User-Agent", "Unknown")[:100]
         logger.warning(
             "File not found for upload request",
@@ -223,81 +425,71 @@ async def serve_upload_file(filename: str, request: Request):
         )
         raise HTTPException(status_code=404, detail=f"File not found: {filename}")
 
-    file_size = file_path.stat().st_size
-
-    # Content-Type from extension (Instagram is strict)
-    ext = file_path.suffix.lower()
-    content_type = (
-        "image/jpeg" if ext in [".jpg", ".jpeg"] else
-        "image/png" if ext == ".png" else
-        "video/mp4" if ext in [".mp4", ".mov"] else
-        "image/gif" if ext == ".gif" else
-        "image/webp" if ext == ".webp" else
-        (mimetypes.guess_type(str(file_path))[0] or "application/octet-stream")
-    )
-
-    # Byte-range: Instagram sends Range for MP4; required for video streaming
-    range_tuple = _parse_range_header(request.headers.get("Range"), file_size)
+    file_size = stat_result.st_size
 
-    # Base headers for Instagram compatibility
+    # Base headers for Instagram compatibility, plus validators so repeat fetches can revalidate
+    etag, last_modified = _upload_validators(stat_result)
     base_headers = {
         "Content-Type": content_type,
-        "Access-Control-Allow-Origin": "*",
-        "Access-Control-Allow-Methods": "GET, HEAD, OPTIONS",
-        "Access-Control-Allow-Headers": "Range",
-        "Cache-Control": "public, max-age=31536000",
-        "Accept-Ranges": "bytes",
+        **_UPLOAD_HEADERS,
+        "ETag": etag,
+        "Last-Modified": last_modified,
     }
+    if _upload_not_modified(request, etag, stat_result):
+        return Response(status_code=304, headers=base_headers)
 
-    user_agent = request.headers.get("User-Agent", "Unknown")
-    logger.info(
-        "Serving uploaded file",
-        filename=filename,
-        content_type=content_type,
-        file_size=file_size,
-        has_range=range_tuple is not None,
-        user_agent=user_agent[:100],
-        method=request.method,
-    )
+    # Byte-range: Instagram sends Range for MP4; required for video streaming
+    try:
+        range_tuple = _parse_range_header(request.headers.get("Range"), file_size)
+    except ValueError:
+        return Response(status_code=416, headers={
+            **base_headers,
+            "Content-Range": f"bytes */{file_size}",
+        })
+
+    # Per-request trace, only built when DEBUG is enabled (crawlers fetch uploads in bursts)
+    if _std_logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Serving uploaded file",
+            filename=filename,
+            content_type=content_type,
+            file_size=file_size,
+            has_range=range_tuple is not None,
+            user_agent=request.headers.get("User-Agent", "Unknown")[:100],
+            method=request.method,
+        )
 
-    # HEAD: return headers only
+    # Behind nginx / Apache: validation is done, hand the file transfer to the proxy
+    if UPLOADS_X_ACCEL_PREFIX:
+        return Response(headers={
+            **base_headers,
+            "X-Accel-Redirect": _X_ACCEL_BASE + quote(filename),
+        })
+    if UPLOADS_X_SENDFILE:
+        return Response(headers={**base_headers, "X-Sendfile": str(file_path)})
+
+    # HEAD: return headers only, before any body iterator is built
     if request.method == "HEAD":
         if range_tuple:
             start, end = range_tuple
-            length = end - start + 1
-            resp = Response(status_code=206, headers={
+            return Response(status_code=206, headers={
                 **base_headers,
-                "Content-Length": str(length),
+                "Content-Length": str(end - start + 1),
                 "Content-Range": f"bytes {start}-{end}/{file_size}",
             })
-        else:
-            resp = Response(status_code=200, headers={
-                **base_headers,
-                "Content-Length": str(file_size),
-            })
-        resp.delete_cookie = lambda *a, **kw: None
-        return resp
+        return Response(status_code=200, headers={
+            **base_headers,
+            "Content-Length": str(file_size),
+        })
 
-    # GET: full or partial content
+    # GET: full or partial content (no cookies are ever set here: /uploads/ bypasses auth)
     if range_tuple:
         start, end = range_tuple
         length = end - start + 1
+        chunk_size = _VIDEO_RANGE_CHUNK_SIZE if content_type.startswith("video/") else _RANGE_CHUNK_SIZE
 
-        def iter_range():
-            with open(file_path, "rb") as f:
-                f.seek(start)
-                remaining = length
-                chunk_size = 8192
-                while remaining > 0:
-                    to_read = min(chunk_size, remaining)
-                    chunk = f.read(to_read)
-                    if not chunk:
-                        break
-                    remaining -= len(chunk)
-                    yield chunk
-
-        response = StreamingResponse(
-            iter_range(),
+        return StreamingResponse(
+            _iter_file_range(file_path, start, length, chunk_size),
             media_type=content_type,
             status_code=206,
             headers={
@@ -307,31 +499,27 @@ async def serve_upload_file(filename: str, request: Request):
             },
         )
     else:
-        def iterfile():
-            with open(file_path, "rb") as f:
-                while True:
-                    chunk = f.read(8192)
-                    if not chunk:
-                        break
-                    yield chunk
-
-        response = StreamingResponse(
-            iterfile(),
+        # FileResponse reads the file off the event loop; reuse the stat we already did
+        return FileResponse(
+            file_path,
             media_type=content_type,
-            headers={
-                **base_headers,
-                "Content-Length": str(file_size),
-            },
+            headers=base_headers,
+            stat_result=stat_result,
         )
 
-    response.delete_cookie = lambda *a, **kw: None
-    if hasattr(response, "headers") and "Set-Cookie" in response.headers:
-        del response.headers["Set-Cookie"]
-    return response
-
-# Templates
+# Templates: in production templates don't change, so skip Jinja's per-render mtime checks
 templates_path = Path(__file__).parent / "templates"
-jinja_env = Environment(loader=FileSystemLoader(templates_path))
+_TEMPLATES_AUTO_RELOAD = ENVIRONMENT != "production"
+jinja_env = Environment(
+    loader=FileSystemLoader(templates_path),
+    auto_reload=_TEMPLATES_AUTO_RELOAD,
+    cache_size=400,
+)
+
+# Pages rendered with only {"request": request} depend on nothing but the template and the
+# URL path (layout.html highlights the active nav item), so production serves them from here
+_PAGE_CACHE_MAXSIZE = 256
+_rendered_pages: Dict[Tuple[str, str], str] = {}
 
 def _render_template_sync(template_name: str, context: dict) -> str:
     """Sync Jinja2 render (used from threadpool to avoid blocking event loop)."""
@@ -339,9 +527,56 @@ def _render_template_sync(template_name: str, context: dict) -> str:
     return template.render(**context)
 
 
+# (URL path, template) of the pages rendered with only the request, pre-rendered at production startup
+_STATIC_PAGES = (
+    ("/", "index.html"),
+    ("/schedule", "schedule.html"),
+    ("/batch", "batch.html"),
+    ("/posts", "posts.html"),
+    ("/logs", "logs.html"),
+    ("/accounts", "accounts.html"),
+    ("/warmup", "warmup.html"),
+    ("/config", "config.html"),
+    ("/ai-settings", "ai-settings.html"),
+    ("/inbox", "inbox.html"),
+    ("/pricing", "pricing.html"),
+    ("/login", "login.html"),
+    ("/register", "register.html"),
+    ("/users", "users.html"),
+)
+
+
+def _prerender_static_pages() -> None:
+    """Compile every template and fill the rendered-page cache so first hits don't pay for Jinja."""
+    # Pages rendered with extra context (users, config, webhook-test) can't be cached as HTML,
+    # but with auto_reload off their compiled templates stay in jinja_env's cache once loaded
+    for template_name in jinja_env.list_templates(extensions=["html"]):
+        try:
+            jinja_env.get_template(template_name)
+        except Exception as e:
+            logger.warning("Template compile failed", template=template_name, error=str(e))
+    for path, template_name in _STATIC_PAGES:
+        request = Request({"type": "http", "method": "GET", "path": path, "headers": [], "query_string": b""})
+        try:
+            _rendered_pages[(template_name, path)] = _render_template_sync(template_name, {"request": request})
+        except Exception as e:
+            logger.warning("Page pre-render failed", template=template_name, error=str(e))
+
+
 async def render_template_async(template_name: str, context: dict) -> str:
     """Render Jinja2 template in threadpool so the event loop is not blocked."""
-    return await run_in_threadpool(_render_template_sync, template_name, context)
+    request = context.get("request")
+    if _TEMPLATES_AUTO_RELOAD or request is None or len(context) != 1:
+        return await run_in_threadpool(_render_template_sync, template_name, context)
+
+    key = (template_name, request.url.path)
+    content = _rendered_pages.get(key)
+    if content is None:
+        content = await run_in_threadpool(_render_template_sync, template_name, context)
+        if len(_rendered_pages) >= _PAGE_CACHE_MAXSIZE:
+            _rendered_pages.clear()
+        _rendered_pages[key] = content
+    return content
 
 # Include API router
 app.include_router(api_router)
@@ -351,6 +586,7 @@ app.include_router(auth_router)
 # Meta sends GET with hub.mode=subscribe&hub.verify_token=XXX&hub.challenge=YYY.
 # We must return 200 with body = challenge (plain text). Use same value in Meta and WEBHOOK_VERIFY_TOKEN.
 WEBHOOK_VERIFY_TOKEN = (os.environ.get("WEBHOOK_VERIFY_TOKEN") or "my_test_token_for_instagram_verification").strip()
+_WEBHOOK_VERIFY_TOKEN_BYTES = WEBHOOK_VERIFY_TOKEN.encode("utf-8")
 
 
 def _webhook_verify_get(request: Request):
@@ -359,28 +595,29 @@ def _webhook_verify_get(request: Request):
     Only treat as Meta verification when hub.mode=subscribe; otherwise return 200 so
     browser visits and health checks never get 403.
     """
-    from src.utils.logger import get_logger
-    webhook_logger = get_logger(__name__)
 
-    mode = (request.query_params.get("hub.mode") or "").strip()
-    token = (request.query_params.get("hub.verify_token") or "").strip()
-    challenge = (request.query_params.get("hub.challenge") or "").strip()
+    query_params = request.query_params
+    mode = (query_params.get("hub.mode") or "").strip()
+    token = (query_params.get("hub.verify_token") or "").strip()
+    challenge = (query_params.get("hub.challenge") or "").strip()
 
     # Only run strict verification when Meta actually sends hub.mode=subscribe
     if mode == "subscribe":
-        webhook_logger.info(
+        # Constant-time comparison so the token can't be guessed from response timing
+        token_matches = bool(token) and hmac.compare_digest(token.encode("utf-8"), _WEBHOOK_VERIFY_TOKEN_BYTES)
+        logger.info(
             "Instagram webhook verification request",
             has_token=bool(token),
-            token_matches=(token == WEBHOOK_VERIFY_TOKEN) if token else False,
+            token_matches=token_matches,
             has_challenge=bool(challenge),
             url=str(request.url),
         )
-        if token == WEBHOOK_VERIFY_TOKEN and challenge:
-            webhook_logger.info("Instagram webhook verification successful")
+        if token_matches and challenge:
+            logger.info("Instagram webhook verification successful")
             return PlainTextResponse(content=challenge, status_code=200)
-        webhook_logger.warning(
+        logger.warning(
             "Instagram webhook verification failed (403). Use the same Verify token in Meta as WEBHOOK_VERIFY_TOKEN in .env.",
-            token_matches=(token == WEBHOOK_VERIFY_TOKEN) if token else False,
+            token_matches=token_matches,
         )
         raise HTTPException(
             status_code=403,
@@ -409,11 +646,8 @@ async def webhook_instagram_verify_trailing_slash(request: Request):
 @app.post("/webhooks/instagram")
 async def webhook_instagram_events(request: Request):
     """Webhook verification (GET) is separate. POST: receive events, log payloads, forward comments/messages."""
-    from src.utils.logger import get_logger
-    import json
-    webhook_logger = get_logger(__name__)
     
-    webhook_logger.info(
+    logger.info(
         "=== WEBHOOK POST RECEIVED ===",
         method=request.method,
         url=str(request.url),
@@ -427,7 +661,7 @@ async def webhook_instagram_events(request: Request):
         body_bytes = await request.body()
         body_preview = body_bytes[:500].decode('utf-8', errors='ignore') if body_bytes else None
         
-        webhook_logger.info(
+        logger.info(
             "Webhook body received",
             body_size=len(body_bytes),
             body_preview=body_preview,
@@ -435,11 +669,11 @@ async def webhook_instagram_events(request: Request):
         
         # Parse JSON
         if body_bytes:
-            body = json.loads(body_bytes)
+            body = _json_loads(body_bytes)
         else:
             body = {}
         
-        webhook_logger.info(
+        logger.info(
             "Instagram webhook body parsed",
             body_type=type(body).__name__,
             body_keys=list(body.keys()) if isinstance(body, dict) else None,
@@ -447,26 +681,26 @@ async def webhook_instagram_events(request: Request):
             object_type=body.get("object") if isinstance(body, dict) else None,
         )
     except json.JSONDecodeError as e:
-        webhook_logger.error(
+        logger.error(
             "Instagram webhook JSON parse failed",
             error=str(e),
             body_preview=body_bytes[:500].decode('utf-8', errors='ignore') if 'body_bytes' in locals() else None,
         )
         return JSONResponse(status_code=400, content={"status": "error", "detail": "Invalid JSON"})
     except Exception as e:
-        webhook_logger.exception("Instagram webhook body read failed", error=str(e))
+        logger.exception("Instagram webhook body read failed", error=str(e))
         return JSONResponse(status_code=500, content={"status": "error", "detail": str(e)})
     
     # Process webhook
     try:
         if instaforge_app is None:
-            webhook_logger.error("InstaForge app not initialized")
+            logger.error("InstaForge app not initialized")
             return JSONResponse(status_code=500, content={"status": "error", "detail": "App not initialized"})
         
         process_webhook_payload(body, instaforge_app)
-        webhook_logger.info("Instagram webhook processing completed successfully")
+        logger.info("Instagram webhook processing completed successfully")
     except Exception as e:
-        webhook_logger.exception("Instagram webhook processing error", error=str(e))
+        logger.exception("Instagram webhook processing error", error=str(e))
     
     return JSONResponse(status_code=200, content={"status": "ok"})
 
@@ -474,6 +708,17 @@ async def webhook_instagram_events(request: Request):
 instaforge_app: Optional[InstaForgeApp] = None
 
 
+def _warn_duplicate_routes() -> None:
+    """Log routes registered more than once for the same path and method (only the first one is ever matched)."""
+    seen = set()
+    for route in app.routes:
+        for method in getattr(route, "methods", None) or ():
+            key = (route.path, method)
+            if key in seen:
+                logger.warning("Duplicate route registered", path=route.path, method=method)
+            seen.add(key)
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize InstaForge app on startup"""
@@ -481,6 +726,11 @@ async def startup_event():
     try:
         # Only start Cloudflare tunnel in development when not already started by web_server.py
         ENVIRONMENT = os.getenv("ENVIRONMENT", "development").lower()
+        to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_TOKENS
+        if ENVIRONMENT == "development":
+            _warn_duplicate_routes()
+        if not _TEMPLATES_AUTO_RELOAD:
+            await run_in_threadpool(_prerender_static_pages)
         if ENVIRONMENT == "development" and os.getenv("CLOUDFLARE_STARTED_BY_WEB_SERVER") != "1":
             port = int(os.getenv("PORT", os.getenv("WEB_PORT", "8000")))
             print("Starting Cloudflare tunnel (development mode)...")
@@ -493,9 +743,14 @@ async def startup_event():
         instaforge_app.initialize()
         
         # Set app instance for API routes
-        from .api import set_app_instance
         set_app_instance(instaforge_app)
         
+        # Expired login sessions are reaped in the background (runs in sleep mode too)
+        try:
+            start_session_sweeper(interval_seconds=SESSION_SWEEP_INTERVAL_SECONDS)
+        except Exception as e:
+            logger.warning(f"Failed to start session sweeper: {e}", exc_info=True)
+        
         # Sleep mode: no scheduled posts, warming, comment monitor, token refresh, or health monitoring
         _sleep = (os.getenv("SLEEP_MODE") or os.getenv("PAUSE_ALL") or "").strip().lower() in ("1", "true", "yes")
         if _sleep:
@@ -512,14 +767,12 @@ async def startup_event():
             
             # Start background loop to publish scheduled posts when due (cron-style interval)
             try:
-                from web.cron_config import SCHEDULED_PUBLISHER_INTERVAL_SECONDS
                 start_scheduled_publisher(instaforge_app, interval_seconds=SCHEDULED_PUBLISHER_INTERVAL_SECONDS)
             except Exception as e:
                 logger.error(f"Failed to start scheduled publisher: {e}", exc_info=True)
             
             # Daily token refresh for OAuth accounts (cron-style, rate limit friendly)
             try:
-                from web.cron_config import TOKEN_REFRESH_INTERVAL_SECONDS
                 start_daily_token_refresh_job(instaforge_app, interval_seconds=TOKEN_REFRESH_INTERVAL_SECONDS)
             except Exception as e:
                 logger.error(f"Failed to start token refresh job: {e}", exc_info=True)
@@ -568,6 +821,16 @@ async def shutdown_event():
     
     logger.info("Shutdown event triggered - stopping all services")
     
+    try:
+        stop_session_sweeper()
+    except Exception as e:
+        logger.warning("Error stopping session sweeper", error=str(e))
+    
+    try:
+        shutdown_dm_workers()
+    except Exception as e:
+        logger.warning("Error stopping webhook DM workers", error=str(e))
+    
     # Stop Cloudflare tunnel (only if it was started in development)
     ENVIRONMENT = os.getenv("ENVIRONMENT", "development").lower()
     if ENVIRONMENT == "development":
@@ -642,16 +905,22 @@ async def shutdown_event():
 
 async def _get_user_from_request(request: Request):
     """Get current user from request (for page handlers)."""
-    from web.auth_deps import get_session_token
-    from src.auth.user_auth import validate_session
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        # Already validated by AuthMiddlewareASGI
+        return user
     token = get_session_token(request)
-    return await run_in_threadpool(validate_session, token) if token else None
+    if not token:
+        return None
+    try:
+        return await _validate_session_async(token)
+    except asyncio.TimeoutError:
+        return None
 
 
 @app.get("/favicon.ico")
 async def favicon():
     """Serve favicon to avoid 404 when browsers request it."""
-    from fastapi.responses import Response
     svg = '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100"><text y=".9em" font-size="90">🚀</text></svg>'
     return Response(content=svg.encode("utf-8"), media_type="image/svg+xml")
 
@@ -728,16 +997,11 @@ async def warmup_page(request: Request):
 @app.get("/webhook-test", response_class=HTMLResponse)
 async def webhook_test_page(request: Request):
     """Webhook and AI DM test page (admin only)"""
-    from web.auth_deps import get_session_token
-    from src.auth.user_auth import validate_session
-
-    token = get_session_token(request)
-    user = await run_in_threadpool(validate_session, token) if token else None
+    user = await _get_user_from_request(request)
 
     if not user or user.role != "admin":
         return RedirectResponse(url="/login", status_code=302)
 
-    from .webhook_config import get_webhook_config
     webhook_config = get_webhook_config()
     content = await render_template_async(
         "webhook-test.html",
@@ -749,11 +1013,7 @@ async def webhook_test_page(request: Request):
 @app.get("/config", response_class=HTMLResponse)
 async def config_page(request: Request):
     """Configuration page (admin only)"""
-    from web.auth_deps import get_session_token
-    from src.auth.user_auth import validate_session
-
-    token = get_session_token(request)
-    user = await run_in_threadpool(validate_session, token) if token else None
+    user = await _get_user_from_request(request)
 
     if not user or user.role != "admin":
         return RedirectResponse(url="/login", status_code=302)
@@ -807,11 +1067,7 @@ async def register_page(request: Request):
 async def users_page(request: Request):
     """User management page (admin only)"""
     # Check if user is admin (middleware already checked auth)
-    from web.auth_deps import get_session_token
-    from src.auth.user_auth import validate_session
-    
-    token = get_session_token(request)
-    user = await run_in_threadpool(validate_session, token) if token else None
+    user = await _get_user_from_request(request)
     
     if not user or user.role != "admin":
         return RedirectResponse(url="/login", status_code=302)